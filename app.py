@@ -1,26 +1,168 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, current_app, render_template, request, redirect, url_for, jsonify, abort, send_from_directory, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 import swisseph as swe
+import click
 import datetime
 import pytz
 import os
 import math
+import json
+import time
+import tempfile
+import gzip
+import base64
+import gc
+import threading
+import csv
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
 # ייבוא הנתונים מקובץ הטעינה החיצוני (data_loader.py)
 # וודא שהקובץ data_loader.py נמצא באותה תיקייה
-from data_loader import ASTRO_CONTENT, ZODIAC_SIGNS
+from data_loader import ASTRO_CONTENT, ZODIAC_SIGNS, CONTENT_VERSION, CONTENT_UPDATED_AT, SNAPSHOT_PATH
+from batch_engine import compute_charts, BODIES, CHART_POINTS
+from chart_cache import ChartCache
+from fragment_cache import FragmentCache, template_version
+from geocoding import CachedGeocoder, StaticGeocoder
+from assets import AssetManifest, PLACEHOLDER_IMAGE_URL, IMMUTABLE_CACHE_CONTROL
+from bulk_import import read_records, chunked, parallel_charts, chart_slice
+from transits import degree_visits
+from instrumentation import Metrics
+from timezones import normalize_birth, normalize_births, resolver as timezone_resolver
+import synastry
+from search_index import ContentSearch
+import population_stats
+import souls_export
+import ephemeris_table
+from gazetteer import Gazetteer
 
 app = Flask(__name__)
 
+# APP_ENV=production מופעל דרך wsgi.py (gunicorn) - ראה prepare_for_fork למטה
+app.config['PRODUCTION'] = os.environ.get('APP_ENV') == 'production'
+if app.config['PRODUCTION']:
+    app.config['DEBUG'] = False
+
 # === הגדרת מסד הנתונים ===
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///souls.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///souls.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# SQLite עם כמה תהליכים: WAL (קוראים לא חוסמים את הכותב), המתנה לנעילה במקום שגיאה,
+# ו-pool קבוע של חיבורים לכל worker
+app.config['SQLITE_WAL'] = os.environ.get('SQLITE_WAL', '1' if app.config['PRODUCTION'] else '0') == '1'
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+def is_sqlite_file(config):
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    return uri.startswith('sqlite') and ':memory:' not in uri
+
+def engine_options(config):
+    if not is_sqlite_file(config):
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_POOL_SIZE'] * 2,
+        'connect_args': {'timeout': 15},
+    }
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
 db = SQLAlchemy(app)
 
-# === תיקון גיאוקודר (זמן המתנה ארוך יותר) ===
-geolocator = Nominatim(user_agent="inside_time_app_unique_id", timeout=10)
+def sqlite_pragmas(wal):
+    def set_sqlite_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL") # בטוח ב-WAL, וחוסך fsync בכל commit
+        cursor.execute("PRAGMA busy_timeout=15000")
+        cursor.close()
+    return set_sqlite_pragmas
+
+def configure_engine(flask_app):
+    """pragmas של SQLite על ה-engine של האפליקציה (כל מופע - engine משלו)"""
+    if is_sqlite_file(flask_app.config):
+        with flask_app.app_context():
+            event.listen(db.engine, 'connect', sqlite_pragmas(flask_app.config['SQLITE_WAL']))
+
+configure_engine(app)
+
+# === מטמון מפות (LRU בזיכרון, ואופציונלית גם קובץ על הדיסק) ===
+app.config['CHART_CACHE_SIZE'] = int(os.environ.get('CHART_CACHE_SIZE', 2048))
+app.config['CHART_CACHE_PATH'] = os.environ.get('CHART_CACHE_PATH')
+app.config['CHART_CACHE_DISK_SIZE'] = int(os.environ.get('CHART_CACHE_DISK_SIZE', 100000))
+chart_cache = ChartCache(maxsize=app.config['CHART_CACHE_SIZE'],
+                         disk_path=app.config['CHART_CACHE_PATH'],
+                         disk_maxsize=app.config['CHART_CACHE_DISK_SIZE'])
+
+# === גיאוקודר עם מטמון קבוע (טבלת SQLite) ===
+# GEOCODER_OFFLINE_FILE: קובץ JSON של {עיר: [lat, lon]} לעבודה בלי רשת (ולבדיקות)
+app.config['GEOCODER_OFFLINE_FILE'] = os.environ.get('GEOCODER_OFFLINE_FILE')
+app.config['GEOCODE_CACHE_PATH'] = os.environ.get(
+    'GEOCODE_CACHE_PATH', os.path.join(app.instance_path, 'geocode_cache.db'))
+os.makedirs(app.instance_path, exist_ok=True)
+
+if app.config['GEOCODER_OFFLINE_FILE']:
+    # גיאוקודר מקומי - אין צורך להגביל קצב
+    upstream_geocoder = StaticGeocoder.from_json(app.config['GEOCODER_OFFLINE_FILE'])
+    geocoder = CachedGeocoder(upstream_geocoder, app.config['GEOCODE_CACHE_PATH'], min_interval=0)
+else:
+    upstream_geocoder = Nominatim(user_agent="inside_time_app_unique_id", timeout=10)
+    geocoder = CachedGeocoder(upstream_geocoder, app.config['GEOCODE_CACHE_PATH'])
+
+# === השלמה אוטומטית של ערים מקובץ מקומי (GeoNames cities*.txt או CSV) ===
+app.config['GAZETTEER_PATH'] = os.environ.get(
+    'GAZETTEER_PATH', os.path.join(app.instance_path, 'cities15000.txt'))
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def city_index():
+    """האינדקס נטען בשימוש הראשון (או ב-prepare_for_fork לפני ה-fork). None אם אין קובץ"""
+    global _gazetteer
+    if _gazetteer is None and os.path.exists(app.config['GAZETTEER_PATH']):
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                start = time.perf_counter()
+                _gazetteer = Gazetteer.load(app.config['GAZETTEER_PATH'])
+                print(f"✅ Loaded {len(_gazetteer)} places from '{app.config['GAZETTEER_PATH']}' "
+                      f"in {time.perf_counter() - start:.2f}s")
+    return _gazetteer
+
+# === ייבוא המוני ===
+app.config['IMPORT_BATCH_SIZE'] = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+app.config['IMPORT_MAX_WORKERS'] = int(os.environ.get('IMPORT_MAX_WORKERS', os.cpu_count() or 1))
+
+# === טבלת אפמריס יומית (מיקומים מהירים ומקורבים) - פעילה רק אם הקובץ נבנה ===
+app.config['EPHEMERIS_TABLE_PATH'] = os.environ.get(
+    'EPHEMERIS_TABLE_PATH', os.path.join(app.instance_path, 'ephemeris_daily.npy'))
+if ephemeris_table.activate(app.config['EPHEMERIS_TABLE_PATH']):
+    print(f"✅ Fast positions from '{app.config['EPHEMERIS_TABLE_PATH']}' "
+          f"({ephemeris_table.active().meta['start_year']}-{ephemeris_table.active().meta['end_year']})")
+
+# === API מפות במנות (POST /api/charts) ===
+app.config['CHARTS_API_MAX_RECORDS'] = int(os.environ.get('CHARTS_API_MAX_RECORDS', 1000))
+# כל worker של gunicorn מחזיק pool משלו - ברירת המחדל מחלקת את המעבדים ביניהם
+app.config['CHARTS_API_WORKERS'] = int(os.environ.get(
+    'CHARTS_API_WORKERS', max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)))))
+app.config['CHARTS_API_CHUNK_SIZE'] = int(os.environ.get('CHARTS_API_CHUNK_SIZE', 100))
+
+# === מניפסט תמונות (נבנה פעם אחת בעלייה - בלי os.path.exists בכל בקשה) ===
+asset_manifest = AssetManifest(app.static_folder)
+
+# === חיפוש טקסט חופשי בפירושים (האינדקס נשמר ב-snapshot של התוכן) ===
+content_search = ContentSearch(ASTRO_CONTENT, SNAPSHOT_PATH, version=CONTENT_VERSION)
+
+# גרסת נתוני המעלות (טקסטים + תמונות) - משמשת כ-ETag ל-API של המודאל
+DEGREE_DATA_VERSION = f"{CONTENT_VERSION}-{asset_manifest.version}"
+# הרשומות מפנות גם לתמונות - Last-Modified לפי המאוחר מבין התוכן והמניפסט
+DEGREE_DATA_UPDATED_AT = max(CONTENT_UPDATED_AT, asset_manifest.updated_at)
+
+# === מטמון HTML מרונדר של דפי פרופיל ותצוגה מקדימה ===
+# הגרסה כוללת תוכן, תמונות ותבניות - כל שינוי באחד מהם מחטיא את כל הדפים הישנים
+app.config['FRAGMENT_CACHE_BYTES'] = int(os.environ.get('FRAGMENT_CACHE_BYTES', 32 * 1024 * 1024))
+fragment_cache = FragmentCache(max_bytes=app.config['FRAGMENT_CACHE_BYTES'])
+FRAGMENT_VERSION = f"{DEGREE_DATA_VERSION}-{template_version(app.template_folder)}"
 
 # === הגדרת המודל (הטבלה) ===
 class User(db.Model):
@@ -31,127 +173,432 @@ class User(db.Model):
     birth_time = db.Column(db.String(20), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
+    # זמן הלידה המנורמל (מחושב מ-birth_date/birth_time ואיזור הזמן של מקום הלידה)
+    birth_utc = db.Column(db.DateTime)
+    julian_day = db.Column(db.Float, index=True)
+    timezone = db.Column(db.String(64))
 
-# יצירת הטבלאות בפעם הראשונה
+# אינדקסים לחיפוש תחילית (ללא תלות באותיות גדולות/קטנות) ולדפדוף ב-/database
+db.Index('ix_user_name_nocase', db.collate(User.name, 'NOCASE'))
+db.Index('ix_user_city_nocase', db.collate(User.city, 'NOCASE'))
+
+# === טבלת מיקומים מחושבים (אינדקס למחקר) ===
+# שורה לכל גוף במפה של כל משתמש, כדי ש-/research לא יחשב מחדש את כל המפות
+class Placement(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    body = db.Column(db.String(20), nullable=False)
+    sign = db.Column(db.String(20), nullable=False)
+    degree = db.Column(db.Integer, nullable=False)
+    house = db.Column(db.Integer, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_placement_sign_degree', 'sign', 'degree'),
+        db.Index('ix_placement_longitude', 'longitude'),
+    )
+
+# === תוצאה יומית מחושבת מראש: אילו נשמות "מופעלות" היום ===
+class DailyActivation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    transit_body = db.Column(db.String(20), nullable=False)
+    transit_longitude = db.Column(db.Float, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    natal_body = db.Column(db.String(20), nullable=False)
+    natal_longitude = db.Column(db.Float, nullable=False)
+    orb = db.Column(db.Float, nullable=False)
+
+# סימון שהיום חושב (גם כשלא נמצאה אף הפעלה) - אחרת יום ריק נראה כמו יום שלא חושב
+class DailyActivationRun(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    orb = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+# === מוני אוכלוסייה: כמה נשמות בכל מעלה (0-359) ובכל בית (0-11), לכל גוף ===
+# מתעדכנים יחד עם שורות ה-Placement, כך שהדשבורד לא סורק את כל הטבלה
+class PlacementStat(db.Model):
+    body = db.Column(db.String(20), primary_key=True)
+    kind = db.Column(db.String(10), primary_key=True) # 'degree' / 'house'
+    slot = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# === מוני גרסה: עולים בכל כתיבה לטבלה, כך שמטמון בזיכרון של כל worker מזהה שינוי
+# בקריאה אחת לפי מפתח ראשי (במקום COUNT/MAX על כל הטבלה) ===
+class DataVersion(db.Model):
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# הגופים שנבדקים בחיפוש המחקר (בלי אופק וראש דרקון)
+RESEARCH_BODIES = ['Sun', 'Moon', 'Mercury', 'Venus', 'Mars',
+                   'Jupiter', 'Saturn', 'Uranus', 'Neptune', 'Pluto']
+
+# אורב במעלות: מעל 30 כל נשמה "מופעלת" כמעט כל יום, ו-0 או פחות לא מוצא כלום
+ACTIVATION_ORB_MAX = 30.0
+app.config['ACTIVATION_ORB'] = float(os.environ.get('ACTIVATION_ORB', 1.0))
+if not 0 < app.config['ACTIVATION_ORB'] <= ACTIVATION_ORB_MAX:
+    raise ValueError(f"ACTIVATION_ORB must be above 0 and at most {ACTIVATION_ORB_MAX:g} degrees, "
+                     f"got {app.config['ACTIVATION_ORB']}")
+
+# === מדידת זמנים (Server-Timing + /metrics) - כבוי כברירת מחדל, וכמעט בלי עלות כשהוא כבוי ===
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '0').lower() in ('1', 'true', 'yes')
+metrics = Metrics(enabled=app.config['METRICS_ENABLED'])
 with app.app_context():
-    db.create_all()
+    metrics.init_app(app, engine=db.engine)
 
 # === פונקציות עזר ===
 
 def get_coordinates_safe(city_name):
-    """מנסה להשיג קואורדינטות עם מנגנון ניסיון חוזר"""
+    """מחזיר קואורדינטות מהמטמון, ורק בפספוס פונה לגיאוקודר (עם ניסיון חוזר)"""
+    # אם נכשלנו לגמרי, נחזיר ערך ריק
+    with metrics.span('geocode'):
+        return geocoder.lookup(city_name)
+
+def parse_birth_datetime(birth_date, birth_time):
+    """מפענח תאריך ושעה (תומך גם ב-YYYY-MM-DD וגם ב-DD/MM/YYYY)"""
+    if '-' in birth_date:
+        # פורמט שמגיע מהדפדפן (HTML date input): 2000-05-15
+        parts = birth_date.split('-')
+        year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
+    elif '/' in birth_date:
+        # פורמט ידני: 15/05/2000
+        parts = birth_date.split('/')
+        day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
+    else:
+        raise ValueError("Unknown date format")
+
+    hour, minute = map(int, birth_time.split(':'))
+    return year, month, day, hour, minute
+
+def coordinates_in_range(lat, lon):
+    """TimezoneFinder זורק ValueError מחוץ לטווח - בודקים לפני שרשומה נכנסת ל-batch"""
     try:
-        location = geolocator.geocode(city_name)
-        if location:
-            return location.latitude, location.longitude
-    except (GeocoderTimedOut, GeocoderServiceError):
-        try:
-            print(f"⚠️ Timeout for {city_name}, trying again...")
-            location = geolocator.geocode(city_name, timeout=15)
-            if location:
-                return location.latitude, location.longitude
-        except:
-            pass
-    
-    # אם נכשלנו לגמרי, נחזיר ערך ריק (או ברירת מחדל אם תרצה)
-    return None, None
+        return -90 <= float(lat) <= 90 and -180 <= float(lon) <= 180
+    except (TypeError, ValueError):
+        return False
+
+def local_birth_datetime(birth_date, birth_time):
+    return datetime.datetime(*parse_birth_datetime(birth_date, birth_time))
+
+def birth_fields(birth_date, birth_time, lat, lon):
+    """זמן לידה מקומי -> {'birth_utc', 'julian_day', 'timezone'} לפי איזור הזמן של מקום הלידה"""
+    return normalize_birth(local_birth_datetime(birth_date, birth_time), lat, lon)
+
+def birth_julian_day(birth_date, birth_time, lat, lon):
+    return birth_fields(birth_date, birth_time, lat, lon)['julian_day']
+
+def apply_birth_fields(user):
+    """מעדכן את השדות המנורמלים של המשתמש. תאריך לא תקין - השדות מתאפסים ו-False חוזר"""
+    try:
+        fields = birth_fields(user.birth_date, user.birth_time, user.latitude, user.longitude)
+    except (ValueError, TypeError, AttributeError) as e:
+        print(f"⚠️ Could not normalize birth time of user {user.id}: {e}")
+        fields = {'birth_utc': None, 'julian_day': None, 'timezone': None}
+    for key, value in fields.items():
+        setattr(user, key, value)
+    return fields['julian_day'] is not None
+
+def user_julian_day(user):
+    """ה-jd השמור של המשתמש; שורה שעוד לא עברה backfill מחושבת (ונשמרת בסשן) כאן"""
+    if user.julian_day is None:
+        apply_birth_fields(user)
+    return user.julian_day
 
-def calculate_chart_data(name, city, birth_date, birth_time):
-    # 1. השגת קואורדינטות
-    lat, lon = get_coordinates_safe(city)
+def compute_chart(jd, lat, lon, user_id=None):
+    """מחשב אופק, בתים ומיקום כל הכוכבים עבור Julian Day ומיקום נתונים (דרך המטמון)"""
+    def compute():
+        with metrics.span('ephemeris'):
+            return compute_charts([jd], [lat], [lon]).chart(0)
+    return chart_cache.get_or_compute(jd, lat, lon, compute, owner=user_id)
+
+def calculate_chart_data(name, city, birth_date, birth_time, lat=None, lon=None):
+    # 1. השגת קואורדינטות (אם לא התקבלו כבר מהקורא)
+    if lat is None:
+        lat, lon = get_coordinates_safe(city)
     
     # אם לא הצלחנו למצוא מיקום, נשתמש בברירת מחדל כדי למנוע קריסה (למרות שב-Preview יש בדיקה מקדימה)
     if lat is None:
         lat, lon = 32.08, 34.78 # תל אביב כברירת מחדל
 
-    # 2. פענוח תאריך ושעה (התיקון: תומך גם ב-YYYY-MM-DD וגם ב-DD/MM/YYYY)
+    # 2. פענוח תאריך ושעה וחישוב Julian Day (הזמן האסטרונומי, לפי איזור הזמן המקומי)
     try:
-        if '-' in birth_date:
-            # פורמט שמגיע מהדפדפן (HTML date input): 2000-05-15
-            parts = birth_date.split('-')
-            year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
-        elif '/' in birth_date:
-            # פורמט ידני: 15/05/2000
-            parts = birth_date.split('/')
-            day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
-        else:
-            raise ValueError("Unknown date format")
-
-        hour, minute = map(int, birth_time.split(':'))
-        
+        jd = birth_julian_day(birth_date, birth_time, lat, lon)
     except Exception as e:
         print(f"Date Parsing Error: {e} | Input: {birth_date} {birth_time}")
         return [], "Invalid Date/Time Format"
 
-    # 3. חישוב Julian Day (הזמן האסטרונומי)
-    # הערה: זה חישוב גס ללא איזור זמן (UTC), לשיפור עתידי אפשר להוסיף timezone
-    t_hour = hour + minute / 60.0
-    jd = swe.julday(year, month, day, t_hour)
+    # 3. חישוב המפה
+    return compute_chart(jd, lat, lon), None
 
-    # 4. רשימת הכוכבים לחישוב
-    bodies = [
-        ('Sun', swe.SUN), ('Moon', swe.MOON), ('Mercury', swe.MERCURY),
-        ('Venus', swe.VENUS), ('Mars', swe.MARS), ('Jupiter', swe.JUPITER),
-        ('Saturn', swe.SATURN), ('Uranus', swe.URANUS), ('Neptune', swe.NEPTUNE),
-        ('Pluto', swe.PLUTO), ('North Node', swe.MEAN_NODE)
-    ]
+def placement_rows(user_id, chart_data):
+    return [{
+        'user_id': user_id, 'body': p['planet'], 'sign': p['sign'],
+        'degree': p['degree_int'], 'house': p['house'], 'longitude': p['degree_total']
+    } for p in chart_data]
 
-    chart_data = []
-    
-    # 5. חישוב בתים (Placidus) ואופק
-    houses, ascmc = swe.houses(jd, lat, lon, b'P')
-    ascendant_deg = ascmc[0]
-
-    # הוספת אופק (Ascendant) לרשימה
-    asc_sign_num = int(ascendant_deg / 30)
-    asc_sign_name = ZODIAC_SIGNS[asc_sign_num]
-    asc_degree_in_sign = ascendant_deg % 30
-    asc_degree_int = int(asc_degree_in_sign) + 1 
-
-    chart_data.append({
-        'planet': 'Ascendant',
-        'sign': asc_sign_name,
-        'degree_total': ascendant_deg,
-        'degree_int': asc_degree_int,
-        'house': 1 # אופק תמיד בית 1
-    })
+def add_placements(user_id, chart_data):
+    rows = placement_rows(user_id, chart_data)
+    db.session.execute(db.insert(Placement), rows)
+    update_population_stats(rows)
 
-    # 6. חישוב כל שאר הכוכבים
-    for body_name, body_id in bodies:
-        res = swe.calc_ut(jd, body_id)
-        deg_total = res[0][0]
-        
-        sign_num = int(deg_total / 30)
-        sign_name = ZODIAC_SIGNS[sign_num]
-        degree_in_sign = deg_total % 30
-        degree_int = int(degree_in_sign) + 1
-
-        # חישוב הבית שבו הכוכב נמצא
-        house_num = 1
-        for i in range(12):
-            h_cusp = houses[i]
-            next_h = houses[(i+1)%12]
-            
-            if h_cusp < next_h:
-                # מצב רגיל: הבית מתחיל ב-10 ונגמר ב-40
-                if h_cusp <= deg_total < next_h:
-                    house_num = i + 1
-                    break
-            else: 
-                # מצב מעבר 360 (למשל בית שמתחיל ב-350 ונגמר ב-20)
-                if h_cusp <= deg_total or deg_total < next_h:
-                    house_num = i + 1
-                    break
-        
-        chart_data.append({
-            'planet': body_name,
-            'sign': sign_name,
-            'degree_total': deg_total,
-            'degree_int': degree_int,
-            'house': house_num
-        })
+def remove_placements(*user_ids):
+    """מוחק את המיקומים של המשתמשים ומוריד אותם מהמונים (ללא commit)"""
+    rows = (db.session.query(Placement.body, Placement.sign, Placement.degree, Placement.house)
+            .filter(Placement.user_id.in_(user_ids)).all())
+    update_population_stats([r._asdict() for r in rows], -1)
+    Placement.query.filter(Placement.user_id.in_(user_ids)).delete(synchronize_session=False)
+
+_stat_table = PlacementStat.__table__
+_increment_stat = (_stat_table.update()
+                   .where(_stat_table.c.body == db.bindparam('b_body'),
+                          _stat_table.c.kind == db.bindparam('b_kind'),
+                          _stat_table.c.slot == db.bindparam('b_slot'))
+                   .values(count=_stat_table.c.count + db.bindparam('delta')))
+
+def bump_data_version(name):
+    """מעלה את מונה הגרסה (ללא commit - נכנס לטרנזקציה של הכתיבה עצמה)"""
+    db.session.execute(db.update(DataVersion).where(DataVersion.name == name)
+                       .values(version=DataVersion.version + 1))
+
+def data_version(name):
+    return db.session.query(DataVersion.version).filter_by(name=name).scalar()
+
+def update_population_stats(rows, sign=1):
+    """
+    מוסיף (או מוריד, sign=-1) שורות Placement למונים - באותה טרנזקציה של הקורא.
+    כל כתיבה ל-Placement עוברת כאן, ולכן גם גרסת 'placements' עולה כאן
+    """
+    if rows:
+        bump_data_version('placements')
+    counts = population_stats.slot_counts(rows)
+    if counts:
+        db.session.execute(_increment_stat, [
+            {'b_body': body, 'b_kind': kind, 'b_slot': slot, 'delta': sign * n}
+            for (body, kind, slot), n in counts.items()
+        ])
+
+def rebuild_population_stats():
+    """בונה את המונים מחדש מטבלת ה-Placement (שתי שאילתות GROUP BY) ומבצע commit"""
+    arrays = population_stats.empty_arrays()
+    index = {body: i for i, body in enumerate(population_stats.STAT_BODIES)}
+    by_degree = (db.session.query(Placement.body, Placement.sign, Placement.degree, db.func.count())
+                 .filter(Placement.body.in_(population_stats.STAT_BODIES))
+                 .group_by(Placement.body, Placement.sign, Placement.degree))
+    for body, sign, degree, n in by_degree:
+        arrays['degree'][index[body], population_stats.degree_slot(sign, degree)] += n
+    by_house = (db.session.query(Placement.body, Placement.house, db.func.count())
+                .filter(Placement.body.in_(population_stats.STAT_BODIES))
+                .group_by(Placement.body, Placement.house))
+    for body, house, n in by_house:
+        arrays['house'][index[body], house - 1] += n
+
+    PlacementStat.query.delete()
+    db.session.execute(db.insert(PlacementStat), [
+        {'body': body, 'kind': kind, 'slot': slot, 'count': int(arrays[kind][i, slot])}
+        for kind in arrays for body, i in index.items() for slot in range(arrays[kind].shape[1])
+    ])
+    db.session.commit()
+
+def init_database():
+    """יצירת הטבלאות בפעם הראשונה, ועדכון סכמה ישנה (בתוך app context)"""
+    db.create_all()
+    # create_all לא מוסיף עמודות חדשות לטבלה שכבר קיימת - מוסיפים אותן כאן (כולן nullable)
+    inspector = db.inspect(db.engine)
+    quote = db.engine.dialect.identifier_preparer.quote
+    for table in db.metadata.sorted_tables:
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} "
+                                         f"{column.type.compile(db.engine.dialect)}"))
+                print(f"✅ Added column {table.name}.{column.name}")
+    # וגם לא אינדקסים חדשים
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    if db.session.get(DataVersion, 'placements') is None:
+        db.session.add(DataVersion(name='placements', version=0))
+        db.session.commit()
+    # טבלת המונים נבנית בפעם הראשונה (או מחדש אם רשימת הגופים השתנתה)
+    expected_cells = len(population_stats.STAT_BODIES) * sum(population_stats.SLOTS.values())
+    if PlacementStat.query.count() != expected_cells:
+        rebuild_population_stats()
+        print("✅ Built population stats from the placement table")
+
+with app.app_context():
+    init_database()
+
+def refresh_placements(user):
+    """כותב מחדש את שורות ה-Placement של המשתמש (ללא commit - באחריות הקורא)"""
+    remove_placements(user.id)
+    jd = user_julian_day(user)
+    if jd is None:
+        # פורמט לא מוכר - המשתמש פשוט לא יופיע במחקר
+        print(f"⚠️ Skipping placements for user {user.id}")
+        return
+
+    add_placements(user.id, compute_chart(jd, user.latitude, user.longitude, user_id=user.id))
+
+def replace_placements(users):
+    """
+    כותב מחדש את שורות ה-Placement של קבוצת משתמשים בחישוב מפות אחד (ללא commit).
+    מחזיר (מספר מפות, שניות חישוב)
+    """
+    ids, jds, lats, lons = [], [], [], []
+    for user in users:
+        jd = user_julian_day(user)
+        if jd is None:
+            print(f"⚠️ Skipping placements for user {user.id}")
+            continue
+        jds.append(jd)
+        ids.append(user.id)
+        lats.append(user.latitude)
+        lons.append(user.longitude)
+
+    remove_placements(*[user.id for user in users])
+    if not ids:
+        return 0, 0.0
+    batch = compute_charts(jds, lats, lons)
+    for i, user_id in enumerate(ids):
+        add_placements(user_id, batch.chart(i))
+    return len(batch), batch.elapsed
 
-    return chart_data, None
+def import_souls(records, batch_size=500, workers=None):
+    """
+    ייבוא המוני: כל עיר מקודדת פעם אחת, המשתמשים נכנסים בטרנזקציות של batch_size,
+    והמפות מחושבות ב-process pool. מחזיר (yield) דו"ח התקדמות אחרי כל batch.
+    """
+    workers = workers or os.cpu_count() or 1
+    cities = {}
+    row_num, imported, skipped = 0, 0, 0
+    errors = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunked(records, batch_size):
+            pending = []
+            for rec in chunk:
+                row_num += 1
+                if not rec.get('name') or not rec.get('birth_date') or not rec.get('birth_time'):
+                    skipped += 1
+                    errors.append({'row': row_num, 'error': 'missing name/birth_date/birth_time'})
+                    continue
+
+                lat, lon = rec.get('latitude'), rec.get('longitude')
+                if lat is None or lon is None:
+                    city = rec.get('city') or ''
+                    if city not in cities:
+                        cities[city] = get_coordinates_safe(city)
+                    lat, lon = cities[city]
+                if lat is None:
+                    skipped += 1
+                    errors.append({'row': row_num, 'error': f"city not found: {rec.get('city')}"})
+                    continue
+                if not coordinates_in_range(lat, lon):
+                    skipped += 1
+                    errors.append({'row': row_num, 'error': f"coordinates out of range: {lat}, {lon}"})
+                    continue
+
+                try:
+                    local_dt = local_birth_datetime(rec['birth_date'], rec['birth_time'])
+                except Exception as e:
+                    skipped += 1
+                    errors.append({'row': row_num, 'error': f"invalid date/time: {e}"})
+                    continue
+                pending.append((rec, lat, lon, local_dt))
+
+            # איזורי זמן לכל ה-batch בבת אחת (כל מקום נבדק פעם אחת)
+            normalized = normalize_births((local_dt, lat, lon) for _, lat, lon, local_dt in pending)
+            users = [User(name=rec['name'], city=rec.get('city') or '',
+                          birth_date=rec['birth_date'], birth_time=rec['birth_time'],
+                          latitude=lat, longitude=lon, **fields)
+                     for (rec, lat, lon, _), fields in zip(pending, normalized)]
+            jds = [fields['julian_day'] for fields in normalized]
+
+            db.session.add_all(users)
+            db.session.flush() # מקבלים את ה-id של כל המשתמשים ב-batch
+            charts = parallel_charts(pool, jds, [u.latitude for u in users],
+                                     [u.longitude for u in users], workers)
+            rows = []
+            for user, chart in zip(users, charts):
+                rows.extend(placement_rows(user.id, chart))
+            if rows:
+                db.session.execute(db.insert(Placement), rows)
+                update_population_stats(rows)
+            db.session.commit()
+
+            imported += len(users)
+            elapsed = time.perf_counter() - start
+            yield {
+                'imported': imported, 'skipped': skipped,
+                'distinct_cities': len(cities),
+                'elapsed': round(elapsed, 2),
+                'rows_per_sec': round(row_num / elapsed, 1) if elapsed else 0.0,
+                'errors': errors[-20:],
+            }
+            errors = []
+
+def transit_positions(jd):
+    body_ids = dict(BODIES)
+    return [(name, swe.calc_ut(jd, body_ids[name])[0][0]) for name in RESEARCH_BODIES]
+
+def longitude_window(lon, orb):
+    """טווחי אורך סביב lon, מפוצלים לשניים כשעוברים את 0°/360°"""
+    lo, hi = lon - orb, lon + orb
+    if lo < 0:
+        return [(lo + 360.0, 360.0), (0.0, hi)]
+    if hi >= 360.0:
+        return [(lo, 360.0), (0.0, hi - 360.0)]
+    return [(lo, hi)]
+
+def find_activations(jd, orb):
+    """כל המיקומים הלידתיים שנמצאים בטווח orb מאחד מעשרת הכוכבים ב-jd (שאילתת טווח על האינדקס)"""
+    results = []
+    for t_body, t_lon in transit_positions(jd):
+        in_orb = db.or_(*[Placement.longitude.between(lo, hi) for lo, hi in longitude_window(t_lon, orb)])
+        rows = (db.session.query(Placement, User.name)
+                .join(User, User.id == Placement.user_id)
+                .filter(in_orb)
+                .all())
+        for placement, user_name in rows:
+            distance = abs((placement.longitude - t_lon + 180.0) % 360.0 - 180.0)
+            results.append({
+                'transit_body': t_body, 'transit_longitude': t_lon,
+                'user_id': placement.user_id, 'name': user_name,
+                'natal_body': placement.body, 'natal_longitude': placement.longitude,
+                'orb': distance,
+            })
+    results.sort(key=lambda r: r['orb'])
+    return results
+
+def asset_url(rel_path):
+    """URL עם hash של התוכן, כך שהדפדפן יכול לשמור את הקובץ לתמיד"""
+    return url_for('fingerprinted_asset', digest=asset_manifest.digests[rel_path], filename=rel_path)
+
+def degree_image_url(sign, degree):
+    rel_path = asset_manifest.degree_image_path(sign, degree)
+    return asset_url(rel_path) if rel_path else PLACEHOLDER_IMAGE_URL
+
+def variant_srcset(rel_path):
+    """{'avif': 'url 160w, url 480w, ...', 'webp': ...} - ריק אם לא נבנו גרסאות מוקטנות"""
+    if not rel_path:
+        return {}
+    return {
+        fmt: ', '.join(f"{asset_url(path)} {width}w" for path, width in entries)
+        for fmt, entries in asset_manifest.srcset_entries(rel_path).items()
+    }
+
+def degree_image_srcset(sign, degree):
+    return variant_srcset(asset_manifest.degree_image_path(sign, degree))
+
+def sign_icon_url(sign):
+    rel_path = asset_manifest.sign_icon_path(sign)
+    return asset_url(rel_path) if rel_path else None
+
+def sign_icon_srcset(sign):
+    # האייקון מוצג בגובה 40px במודאל - גרסאות 64/128 מספיקות גם למסכי רטינה
+    return variant_srcset(asset_manifest.sign_icon_path(sign))
 
 def enrich_planet_data(planet_dict):
     """מוסיפה טקסטים ותמונות לכל כוכב"""
@@ -164,16 +611,9 @@ def enrich_planet_data(planet_dict):
     planet_dict['sign_text'] = ASTRO_CONTENT['signs'].get((p_name, sign), "")
     planet_dict['house_text'] = ASTRO_CONTENT['houses'].get((p_name, house), "")
 
-    # 2. תמונה למעלה
-    sign_lower = sign.lower()
-    image_filename = f"{sign_lower}{degree}.jpg"
-    image_rel_path = f"degree_images/{sign_lower}/{image_filename}"
-    full_path = os.path.join(app.root_path, 'static', image_rel_path)
-
-    if os.path.exists(full_path):
-        planet_dict['image_url'] = url_for('static', filename=image_rel_path)
-    else:
-        planet_dict['image_url'] = "https://via.placeholder.com/400x600?text=No+Image"
+    # 2. תמונה למעלה (מהמניפסט)
+    planet_dict['image_url'] = degree_image_url(sign, degree)
+    planet_dict['image_srcset'] = degree_image_srcset(sign, degree)
 
 # === ROUTES ===
 
@@ -181,26 +621,89 @@ def enrich_planet_data(planet_dict):
 def index():
     return render_template('index.html')
 
+# === רשימת הנשמות: דפדוף לפי מפתח (keyset) במקום טעינת כל הטבלה ===
+SOULS_PAGE_SIZE = 50
+SOUL_SEARCH_FIELDS = ('name', 'city')
+
+def encode_cursor(key, user_id):
+    return base64.urlsafe_b64encode(json.dumps([key, user_id]).encode()).decode()
+
+def decode_cursor(cursor):
+    key, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return str(key), int(user_id)
+
+def souls_page(prefix='', field='name', after=None, limit=SOULS_PAGE_SIZE):
+    """
+    עמוד אחד של נשמות, ממוין לפי השדה (בלי תלות ב-case) ואז id.
+    after הוא הסמן של השורה האחרונה בעמוד הקודם - אין OFFSET, כל עמוד עולה אותו דבר.
+    """
+    sort_key = db.collate(getattr(User, field), 'NOCASE')
+    query = db.session.query(User.id, User.name, User.city, User.birth_date)
+    if prefix:
+        # טווח על האינדקס במקום LIKE
+        query = query.filter(sort_key >= prefix, sort_key < prefix + '\uffff')
+    if after:
+        key, last_id = decode_cursor(after)
+        query = query.filter(db.tuple_(sort_key, User.id) > db.tuple_(key, last_id))
+    rows = query.order_by(sort_key, User.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], field), rows[-1].id)
+    return rows, next_cursor
+
+def souls_request_args():
+    prefix = (request.args.get('q') or '').strip()
+    field = request.args.get('field', 'name')
+    if field not in SOUL_SEARCH_FIELDS:
+        field = 'name'
+    return prefix, field
+
 @app.route('/database')
 def database():
-    users = User.query.all()
-    return render_template('database.html', users=users)
+    prefix, field = souls_request_args()
+    users, next_cursor = souls_page(prefix, field)
+    return render_template('database.html', users=users, next_cursor=next_cursor,
+                           query=prefix, field=field)
+
+@app.route('/api/souls')
+def api_souls():
+    prefix, field = souls_request_args()
+    try:
+        limit = min(max(int(request.args.get('limit', SOULS_PAGE_SIZE)), 1), 200)
+        users, next_cursor = souls_page(prefix, field, after=request.args.get('after'), limit=limit)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
+    return jsonify({
+        'souls': [{'id': u.id, 'name': u.name, 'city': u.city, 'birth_date': u.birth_date,
+                   'url': url_for('profile', user_id=u.id)} for u in users],
+        'next': next_cursor,
+    })
 
 @app.route('/add')
 def add_profile():
     return render_template('add_profile.html')
 
-@app.route('/preview', methods=['POST'])
-def preview_profile():
-    name = request.form.get('name')
-    city = request.form.get('city')
-    birth_date = request.form.get('birth_date')
-    birth_time = request.form.get('birth_time')
+def submitted_coordinates(form):
+    """קואורדינטות שהטופס שלח (נבחרו מההשלמה האוטומטית) - או (None, None)"""
+    try:
+        lat, lon = float(form.get('latitude')), float(form.get('longitude'))
+    except (TypeError, ValueError):
+        return None, None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None, None
+    return lat, lon
+
+class PreviewError(Exception):
+    """הודעת שגיאה להצגה במקום התצוגה המקדימה (לא נשמרת במטמון)"""
 
-    # השגת מיקום לתצוגה מקדימה
-    lat, lon = get_coordinates_safe(city)
+def render_preview(name, city, birth_date, birth_time, lat=None, lon=None):
+    # השגת מיקום לתצוגה מקדימה (רק אם הטופס לא שלח קואורדינטות)
     if lat is None:
-        return "Error: Could not find city location. Please try again."
+        lat, lon = get_coordinates_safe(city)
+    if lat is None:
+        raise PreviewError("Error: Could not find city location. Please try again.")
 
     # יצירת אובייקט משתמש זמני (לא נשמר ב-DB)
     temp_user = User(
@@ -208,13 +711,31 @@ def preview_profile():
         latitude=lat, longitude=lon
     )
 
-    chart_data, error = calculate_chart_data(name, city, birth_date, birth_time)
-    if error: return error
+    chart_data, error = calculate_chart_data(name, city, birth_date, birth_time, lat, lon)
+    if error: raise PreviewError(error)
+
+    with metrics.span('assets'):
+        for p in chart_data:
+            enrich_planet_data(p)
+
+    return render_template('profile.html', user=temp_user, chart_data=chart_data, is_preview=True, back_url=url_for('add_profile'),
+                           degree_bundle_url=url_for('get_degree_bundle', v=DEGREE_DATA_VERSION))
+
+@app.route('/preview', methods=['POST'])
+def preview_profile():
+    name = request.form.get('name')
+    city = request.form.get('city')
+    birth_date = request.form.get('birth_date')
+    birth_time = request.form.get('birth_time')
 
-    for p in chart_data:
-        enrich_planet_data(p)
+    lat, lon = submitted_coordinates(request.form)
 
-    return render_template('profile.html', user=temp_user, chart_data=chart_data, is_preview=True, back_url=url_for('add_profile'))
+    key = ('preview', name, city, birth_date, birth_time, lat, lon, FRAGMENT_VERSION)
+    try:
+        html = fragment_cache.get_or_render(key, lambda: render_preview(name, city, birth_date, birth_time, lat, lon))
+    except PreviewError as e:
+        return str(e)
+    return Response(html, mimetype='text/html')
 
 @app.route('/save_db', methods=['POST'])
 def save_profile_db():
@@ -227,6 +748,9 @@ def save_profile_db():
 
     new_user = User(name=name, city=city, birth_date=birth_date, birth_time=birth_time, latitude=lat, longitude=lon)
     db.session.add(new_user)
+    db.session.flush() # כדי לקבל id לפני כתיבת המיקומים
+    apply_birth_fields(new_user)
+    refresh_placements(new_user)
     db.session.commit()
 
     return redirect(url_for('profile', user_id=new_user.id))
@@ -235,71 +759,14 @@ def save_profile_db():
 def profile(user_id):
     user = User.query.get_or_404(user_id)
     
-    # חישוב המפה מחדש להצגה
-    try:
-        # --- תיקון: זיהוי חכם של פורמט התאריך (מקפים או לוכסנים) ---
-        if '-' in user.birth_date:
-            # פורמט דפדפן: YYYY-MM-DD
-            parts = user.birth_date.split('-')
-            year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
-        elif '/' in user.birth_date:
-            # פורמט ישן/ידני: DD/MM/YYYY
-            parts = user.birth_date.split('/')
-            day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
-        else:
-            raise ValueError("Unknown date format stored in DB")
-
-        hour, minute = map(int, user.birth_time.split(':'))
-        t_hour = hour + minute / 60.0
-        jd = swe.julday(year, month, day, t_hour)
-        
-        # רשימת גופים
-        bodies = [('Sun', swe.SUN), ('Moon', swe.MOON), ('Mercury', swe.MERCURY),
-                  ('Venus', swe.VENUS), ('Mars', swe.MARS), ('Jupiter', swe.JUPITER),
-                  ('Saturn', swe.SATURN), ('Uranus', swe.URANUS), ('Neptune', swe.NEPTUNE),
-                  ('Pluto', swe.PLUTO), ('North Node', swe.MEAN_NODE)]
-        
-        # חישוב בתים לפי הקואורדינטות השמורות של המשתמש
-        houses, ascmc = swe.houses(jd, user.latitude, user.longitude, b'P')
-        
-        chart_data = []
-        
-        # 1. חישוב אופק
-        asc_deg = ascmc[0]
-        asc_s_num = int(asc_deg/30)
-        chart_data.append({
-            'planet': 'Ascendant', 'sign': ZODIAC_SIGNS[asc_s_num],
-            'degree_int': int(asc_deg % 30) + 1, 'house': 1
-        })
-        
-        # 2. חישוב כוכבים
-        for b_name, b_id in bodies:
-            res = swe.calc_ut(jd, b_id)
-            d_tot = res[0][0]
-            s_num = int(d_tot/30)
-            d_int = int(d_tot%30) + 1
-            
-            # מציאת הבית
-            h_num = 1
-            for i in range(12):
-                h_cusp = houses[i]
-                nxt = houses[(i+1)%12]
-                if h_cusp < nxt:
-                    if h_cusp <= d_tot < nxt: h_num = i+1; break
-                else:
-                    if h_cusp <= d_tot or d_tot < nxt: h_num = i+1; break
-            
-            chart_data.append({
-                'planet': b_name, 'sign': ZODIAC_SIGNS[s_num],
-                'degree_int': d_int, 'house': h_num
-            })
-            
-    except Exception as e:
-        return f"Error calculating chart for profile: {e}"
-
-    # העשרת הנתונים (טקסטים ותמונות)
-    for p in chart_data:
-        enrich_planet_data(p)
+    # חישוב המפה מחדש להצגה (מה-jd השמור - בלי פענוח מחרוזות)
+    jd = user_julian_day(user)
+    if jd is None:
+        return f"Error calculating chart for profile: invalid birth date/time '{user.birth_date} {user.birth_time}'"
+    if db.session.is_modified(user):
+        # שורה ישנה שנורמלה עכשיו - גם המיקומים והמונים שלה חושבו מהזמן הישן
+        refresh_placements(user)
+        db.session.commit()
 
     # לוגיקה לכפתור חזרה
     back_source = request.args.get('back_source')
@@ -311,7 +778,23 @@ def profile(user_id):
     else:
         back_url = url_for('index')
 
-    return render_template('profile.html', user=user, chart_data=chart_data, is_preview=False, back_url=back_url)
+    # שדות השורה במפתח: עריכה ב-worker אחר (או מה-CLI) מחטיאה גם בלי invalidate מקומי
+    key = ('profile', user.id, user.name, user.city, user.birth_date, user.birth_time,
+           user.latitude, user.longitude, back_url, FRAGMENT_VERSION)
+    html = fragment_cache.get_or_render(key, lambda: render_profile(user, jd, back_url), owner=user.id)
+    return Response(html, mimetype='text/html')
+
+def render_profile(user, jd, back_url):
+    chart_data = compute_chart(jd, user.latitude, user.longitude, user_id=user.id)
+
+    # העשרת הנתונים (טקסטים ותמונות)
+    with metrics.span('assets'):
+        for p in chart_data:
+            enrich_planet_data(p)
+
+    return render_template('profile.html', user=user, chart_data=chart_data, is_preview=False, back_url=back_url,
+                           degree_bundle_url=url_for('get_degree_bundle', v=DEGREE_DATA_VERSION))
+
 @app.route('/edit_profile/<int:user_id>', methods=['GET', 'POST'])
 def edit_profile(user_id):
     user = User.query.get_or_404(user_id)
@@ -321,15 +804,25 @@ def edit_profile(user_id):
         user.birth_date = request.form['birth_date']
         user.birth_time = request.form['birth_time']
         new_city = request.form['city']
+        lat, lon = submitted_coordinates(request.form)
         
-        # אם העיר השתנתה, נחשב קואורדינטות מחדש
-        if new_city != user.city:
+        if lat is not None:
+            # עיר שנבחרה מההשלמה האוטומטית - הקואורדינטות כבר ידועות
+            user.city = new_city
+            user.latitude = lat
+            user.longitude = lon
+        elif new_city != user.city:
+            # אם העיר השתנתה, נחשב קואורדינטות מחדש
             user.city = new_city
             lat, lon = get_coordinates_safe(new_city)
             if lat:
                 user.latitude = lat
                 user.longitude = lon
         
+        apply_birth_fields(user)
+        chart_cache.invalidate_owner(user.id)
+        fragment_cache.invalidate_owner(user.id)
+        refresh_placements(user)
         db.session.commit()
         return redirect(url_for('profile', user_id=user.id))
         
@@ -338,6 +831,10 @@ def edit_profile(user_id):
 @app.route('/delete_profile/<int:user_id>')
 def delete_profile(user_id):
     user = User.query.get_or_404(user_id)
+    remove_placements(user.id)
+    DailyActivation.query.filter_by(user_id=user.id).delete()
+    chart_cache.invalidate_owner(user.id)
+    fragment_cache.invalidate_owner(user.id)
     db.session.delete(user)
     db.session.commit()
     return redirect(url_for('database')) # או לדף הבית
@@ -365,65 +862,27 @@ def research():
             'sentence': '', 'header': '', 'body': ''
         })
         
-        sign_lower = search_sign.lower()
-        image_filename = f"{sign_lower}{search_degree}.jpg"
-        image_rel_path = f"degree_images/{sign_lower}/{image_filename}"
-        full_path = os.path.join(app.root_path, 'static', image_rel_path)
-        image_url = url_for('static', filename=image_rel_path) if os.path.exists(full_path) else "https://via.placeholder.com/400x600?text=No+Image"
+        image_url = degree_image_url(search_sign, search_degree)
 
         degree_data = {
             'sign': search_sign, 'degree': search_degree,
-            'content': content, 'image_url': image_url
+            'content': content, 'image_url': image_url,
+            'image_srcset': degree_image_srcset(search_sign, search_degree)
         }
 
-        # 2. חיפוש נשמות תואמות (עם תיקון תאריכים)
-        all_users = User.query.all()
-        for u in all_users:
-            try:
-                # --- התיקון כאן: זיהוי חכם של התאריך ---
-                if '-' in u.birth_date:
-                    parts = u.birth_date.split('-')
-                    year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
-                elif '/' in u.birth_date:
-                    parts = u.birth_date.split('/')
-                    day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
-                else:
-                    continue # פורמט לא מוכר, מדלגים
-
-                hour, minute = map(int, u.birth_time.split(':'))
-                t_hour = hour + minute / 60.0
-                jd = swe.julday(year, month, day, t_hour)
-                
-                # בדיקת כוכבים
-                bodies = [swe.SUN, swe.MOON, swe.MERCURY, swe.VENUS, swe.MARS, 
-                          swe.JUPITER, swe.SATURN, swe.URANUS, swe.NEPTUNE, swe.PLUTO]
-                body_names = ['Sun', 'Moon', 'Mercury', 'Venus', 'Mars', 
-                              'Jupiter', 'Saturn', 'Uranus', 'Neptune', 'Pluto']
-                
-                for b_id, b_name in zip(bodies, body_names):
-                    res = swe.calc_ut(jd, b_id)
-                    d_tot = res[0][0]
-                    s_name = ZODIAC_SIGNS[int(d_tot/30)]
-                    d_int = int(d_tot%30) + 1
-                    
-                    if s_name == search_sign and d_int == search_degree:
-                        # אם יש התאמה - נחשב את הבית
-                        houses, _ = swe.houses(jd, u.latitude, u.longitude, b'P')
-                        h_num = 1
-                        for i in range(12):
-                             if houses[i] <= d_tot < houses[(i+1)%12]: 
-                                 h_num = i+1; break
-                             # טיפול במעבר 360-0
-                             if houses[i] > houses[(i+1)%12]:
-                                 if d_tot >= houses[i] or d_tot < houses[(i+1)%12]: h_num = i+1; break
-                        
-                        matching_souls.append({
-                            'name': u.name, 'id': u.id,
-                            'planet': b_name, 'house': h_num
-                        })
-            except Exception as e:
-                # במקרה של שגיאה בחישוב למשתמש ספציפי, נדלג עליו ונמשיך לבא
-                continue
+        # 2. חיפוש נשמות תואמות (שאילתה אחת על האינדקס sign+degree)
+        rows = (db.session.query(Placement, User.name)
+                .join(User, User.id == Placement.user_id)
+                .filter(Placement.sign == search_sign,
+                        Placement.degree == search_degree,
+                        Placement.body.in_(RESEARCH_BODIES))
+                .order_by(Placement.user_id, Placement.id)
+                .all())
+        for placement, user_name in rows:
+            matching_souls.append({
+                'name': user_name, 'id': placement.user_id,
+                'planet': placement.body, 'house': placement.house
+            })
 
         # 3. ניווט (Next/Prev)
         try:
@@ -453,28 +912,132 @@ def research():
                            zodiac_signs=ZODIAC_SIGNS,
                            next_link=next_link, prev_link=prev_link)
 
-# === API למודאל ===
-@app.route('/api/degree_data')
-def get_degree_data():
-    sign = request.args.get('sign')
+# === POPULATION: התפלגות הנשמות על פני המעלות והבתים ===
+def population_arrays():
+    cells = db.session.query(PlacementStat.body, PlacementStat.kind, PlacementStat.slot, PlacementStat.count)
+    return population_stats.to_arrays(cells)
+
+def population_request_body():
+    body = request.args.get('body') or None
+    if body is not None and body not in population_stats.STAT_BODIES:
+        abort(400, description=f"Unknown body '{body}'")
+    return body
+
+@app.route('/population')
+def population():
+    body = population_request_body()
+    summary = population_stats.summarize(population_arrays(), body, top=20)
+    peak = max(summary['degrees']) or 1
+    grid = [(sign, [{'degree': d + 1, 'count': summary['degrees'][i * 30 + d],
+                     'level': summary['degrees'][i * 30 + d] / peak} for d in range(30)])
+            for i, sign in enumerate(ZODIAC_SIGNS)]
+    return render_template('population.html', summary=summary, grid=grid,
+                           bodies=population_stats.STAT_BODIES, house_peak=max(summary['houses']) or 1)
+
+@app.route('/api/population_stats')
+def api_population_stats():
+    """כל המונים (11 גופים x 360 מעלות + 12 בתים) וסיכום לגוף אחד או לכולם - בלי לגעת בטבלת ה-Placement"""
+    body = population_request_body()
     try:
-        degree = int(request.args.get('degree'))
-    except:
-        return jsonify({'error': 'Invalid degree'}), 400
-        
+        top = min(max(int(request.args.get('top', 20)), 1), 360)
+    except ValueError:
+        return jsonify({'error': 'Invalid top'}), 400
+    arrays = population_arrays()
+    bodies = population_stats.STAT_BODIES
+    return jsonify({
+        'bodies': bodies,
+        'signs': ZODIAC_SIGNS,
+        'degrees': {b: arrays['degree'][i].tolist() for i, b in enumerate(bodies)},
+        'houses': {b: arrays['house'][i].tolist() for i, b in enumerate(bodies)},
+        'summary': population_stats.summarize(arrays, body, top=top),
+    })
+
+# === ACTIVATIONS: מי "מופעל" עכשיו ===
+@app.route('/activations')
+def activations():
+    orb = current_app.config['ACTIVATION_ORB']
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    live = request.args.get('live') == '1'
+
+    run = None if live else db.session.get(DailyActivationRun, today)
+    if run is not None:
+        orb = run.orb
+        rows = DailyActivation.query.filter_by(day=today).order_by(DailyActivation.orb).all()
+        names = dict(db.session.query(User.id, User.name)
+                     .filter(User.id.in_({r.user_id for r in rows})).all())
+        matches = [{
+            'transit_body': r.transit_body, 'transit_longitude': r.transit_longitude,
+            'user_id': r.user_id, 'name': names.get(r.user_id, ''),
+            'natal_body': r.natal_body, 'natal_longitude': r.natal_longitude, 'orb': r.orb,
+        } for r in rows]
+        source = 'daily'
+    else:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        jd = swe.julday(now.year, now.month, now.day, now.hour + now.minute / 60.0)
+        matches = find_activations(jd, orb)
+        source = 'live'
+
+    grouped = {}
+    for m in matches:
+        m['transit_sign'] = ZODIAC_SIGNS[int(m['transit_longitude'] / 30) % 12]
+        m['transit_degree'] = int(m['transit_longitude'] % 30) + 1
+        grouped.setdefault(m['transit_body'], []).append(m)
+
+    return render_template('activations.html', grouped=grouped, orb=orb, day=today, source=source)
+
+# === EVOLUTION: מתי כל כוכב עובר במעלה ===
+@app.route('/evolution')
+def evolution():
+    sign = request.args.get('sign', 'Aries')
+    if sign not in ZODIAC_SIGNS:
+        abort(404)
+    try:
+        degree = min(max(int(request.args.get('degree', 1)), 1), 30)
+    except ValueError:
+        degree = 1
+
+    # טווח ברירת מחדל: מתחילת השנה הנוכחית ועד סוף השנה הבאה
+    today = datetime.date.today()
+    try:
+        start = datetime.datetime.strptime(request.args['start'], '%Y-%m-%d')
+    except (KeyError, ValueError):
+        start = datetime.datetime(today.year, 1, 1)
+    try:
+        end = datetime.datetime.strptime(request.args['end'], '%Y-%m-%d')
+    except (KeyError, ValueError):
+        end = datetime.datetime(today.year + 1, 12, 31)
+    if end < start:
+        start, end = end, start
+    # הטבלאות נשמרות במטמון לפי שנים, אז מגבילים את הטווח כדי לא לחשב עשורים בבקשה אחת
+    if end.year - start.year > 20:
+        end = datetime.datetime(start.year + 20, 12, 31)
+
+    content = ASTRO_CONTENT['degrees'].get((sign, degree), {'sentence': '', 'header': '', 'body': ''})
+    visits = degree_visits(sign, degree, start, end)
+
+    s_idx = ZODIAC_SIGNS.index(sign)
+    if degree == 30: n_d, n_s = 1, ZODIAC_SIGNS[(s_idx+1)%12]
+    else: n_d, n_s = degree+1, sign
+    if degree == 1: p_d, p_s = 30, ZODIAC_SIGNS[(s_idx-1)%12]
+    else: p_d, p_s = degree-1, sign
+    range_args = {'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d')}
+
+    return render_template('evolution.html',
+                           sign=sign, degree=degree,
+                           text=content['sentence'] or content['header'],
+                           visits=visits, start=start, end=end,
+                           next_link=url_for('evolution', sign=n_s, degree=n_d, **range_args),
+                           prev_link=url_for('evolution', sign=p_s, degree=p_d, **range_args))
+
+# === API למודאל ===
+def degree_entry(sign, degree):
     content = ASTRO_CONTENT['degrees'].get((sign, degree), {'sentence': '', 'header': '', 'body': ''})
     
     # תמונה
-    sign_lower = sign.lower()
-    img_name = f"{sign_lower}{degree}.jpg"
-    img_path = f"degree_images/{sign_lower}/{img_name}"
-    full_path = os.path.join(app.root_path, 'static', img_path)
-    img_url = url_for('static', filename=img_path) if os.path.exists(full_path) else "https://via.placeholder.com/400x600?text=No+Image"
+    img_url = degree_image_url(sign, degree)
     
-    # אייקון המזל (למעלה במודאל)
-    # אפשר להחזיר נתיב לתמונת SVG או PNG של המזל אם יש
-    # כרגע נשאיר ריק או נשתמש בלוגיקה קיימת אם יש לך תיקיית אייקונים
-    symbol_url = None 
+    # אייקון המזל (למעלה במודאל) - None אם אין קובץ אייקון למזל
+    symbol_url = sign_icon_url(sign)
     
     # ניווט בתוך המודאל
     try: s_idx = ZODIAC_SIGNS.index(sign)
@@ -486,15 +1049,689 @@ def get_degree_data():
     if degree == 1: p_d, p_s = 30, ZODIAC_SIGNS[(s_idx-1)%12]
     else: p_d, p_s = degree-1, sign
 
-    return jsonify({
+    return {
         'sign': sign, 'degree': degree,
         'content': content,
         'image_url': img_url,
+        'image_srcset': degree_image_srcset(sign, degree),
         'symbol_url': symbol_url,
+        'symbol_srcset': sign_icon_srcset(sign),
         'next': {'sign': n_s, 'degree': n_d},
         'prev': {'sign': p_s, 'degree': p_d}
-    })
+    }
+
+def conditional_response(response, max_age=3600, immutable=False, etag=DEGREE_DATA_VERSION):
+    """ETag/Last-Modified לפי גרסת התוכן והתמונות, ו-304 אם הדפדפן כבר מחזיק את הגרסה הזו"""
+    response.set_etag(etag)
+    response.last_modified = DEGREE_DATA_UPDATED_AT
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+@app.route('/api/degree_data')
+def get_degree_data():
+    sign = request.args.get('sign')
+    try:
+        degree = int(request.args.get('degree'))
+    except:
+        return jsonify({'error': 'Invalid degree'}), 400
+
+    return conditional_response(jsonify(degree_entry(sign, degree)))
+
+# חבילה אחת של כל 360 המעלות, דחוסה פעם אחת לכל גרסה
+_degree_bundles = {}
+
+def degree_bundle():
+    if DEGREE_DATA_VERSION not in _degree_bundles:
+        degrees = {f"{s}-{d}": degree_entry(s, d) for s in ZODIAC_SIGNS for d in range(1, 31)}
+        raw = json.dumps({'version': DEGREE_DATA_VERSION, 'degrees': degrees},
+                         ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        _degree_bundles[DEGREE_DATA_VERSION] = (raw, gzip.compress(raw, 9))
+    return _degree_bundles[DEGREE_DATA_VERSION]
+
+@app.route('/api/degree_bundle')
+def get_degree_bundle():
+    raw, compressed = degree_bundle()
+    # ETag חזק מזהה ייצוג אחד בדיוק - לגוף הדחוס תג משלו, כדי שמטמון משותף
+    # לא יענה 304 ללקוח בלי gzip מול העותק הדחוס
+    if 'gzip' in request.accept_encodings:
+        response = Response(compressed, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        etag = f"{DEGREE_DATA_VERSION}-gzip"
+    else:
+        response = Response(raw, mimetype='application/json')
+        etag = DEGREE_DATA_VERSION
+    response.vary.add('Accept-Encoding')
+
+    # כשה-URL כולל את הגרסה הנוכחית התוכן שלו לא ישתנה לעולם
+    immutable = request.args.get('v') == DEGREE_DATA_VERSION
+    return conditional_response(response, max_age=31536000 if immutable else 3600, immutable=immutable, etag=etag)
+
+# === ייבוא המוני (CSV/XLSX) ===
+@app.route('/import', methods=['POST'])
+def import_upload():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'No file uploaded'}), 400
+    try:
+        batch_size = int(request.form.get('batch_size', current_app.config['IMPORT_BATCH_SIZE']))
+    except ValueError:
+        return jsonify({'error': 'Invalid batch_size'}), 400
+
+    # שומרים לקובץ זמני - הזרם של ההעלאה נסגר לפני שהתשובה המוזרמת מסתיימת
+    suffix = os.path.splitext(upload.filename)[1].lower()
+    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    upload.save(tmp)
+    tmp.close()
+    try:
+        records = read_records(tmp.name, upload.filename)
+    except ValueError as e:
+        os.remove(tmp.name)
+        return jsonify({'error': str(e)}), 400
+
+    # התקדמות נשלחת כ-NDJSON, שורה אחרי כל batch
+    def generate():
+        try:
+            for progress in import_souls(records, batch_size=batch_size,
+                                         workers=current_app.config['IMPORT_MAX_WORKERS']):
+                yield json.dumps(progress) + '\n'
+        finally:
+            os.remove(tmp.name)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# === API: מפות לידה במנות ===
+# ה-pool נוצר בבקשה הראשונה - אחרי ה-fork של gunicorn, ופעם אחת לכל worker
+_chart_pool = None
+_chart_pool_lock = threading.Lock()
+
+def chart_pool():
+    global _chart_pool
+    if _chart_pool is None:
+        with _chart_pool_lock:
+            if _chart_pool is None:
+                _chart_pool = ProcessPoolExecutor(max_workers=current_app.config['CHARTS_API_WORKERS'])
+    return _chart_pool
+
+def discard_chart_pool(pool):
+    """process שמת (OOM וכו') שובר את כל ה-pool - משליכים אותו והבקשה הבאה תיצור חדש"""
+    global _chart_pool
+    with _chart_pool_lock:
+        if _chart_pool is pool:
+            _chart_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def parse_chart_record(rec, cities):
+    """רשומת לידה מה-API -> (jd, lat, lon). זורק ValueError עם הודעה ללקוח"""
+    if not isinstance(rec, dict):
+        raise ValueError("Record must be an object")
+    birth_date, birth_time = rec.get('birth_date'), rec.get('birth_time')
+    if not isinstance(birth_date, str) or not isinstance(birth_time, str):
+        raise ValueError("birth_date and birth_time are required strings")
+
+    lat, lon = rec.get('latitude'), rec.get('longitude')
+    if lat is not None or lon is not None:
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            raise ValueError("latitude and longitude must both be numbers")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("latitude/longitude out of range")
+    else:
+        city = rec.get('city')
+        if not city or not isinstance(city, str):
+            raise ValueError("Either latitude/longitude or city is required")
+        if city not in cities:
+            cities[city] = get_coordinates_safe(city)
+        lat, lon = cities[city]
+        if lat is None:
+            raise ValueError(f"Could not find city '{city}'")
+
+    try:
+        return birth_julian_day(birth_date, birth_time, lat, lon), lat, lon
+    except (ValueError, TypeError, IndexError):
+        raise ValueError("Invalid Date/Time Format")
+
+def chart_results(jobs):
+    """
+    jobs: [(index, jd, lat, lon)]. מחזיר (yield) (index, chart או None, error או None)
+    לפי סדר הסיום - כל מנה של CHARTS_API_CHUNK_SIZE רצה ב-process אחר.
+    מנה קטנה מחושבת כאן, בלי לשלם על מעבר בין תהליכים.
+    """
+    chunk_size = current_app.config['CHARTS_API_CHUNK_SIZE']
+    if len(jobs) <= chunk_size or current_app.config['CHARTS_API_WORKERS'] <= 1:
+        for chunk in chunked(jobs, chunk_size):
+            try:
+                with metrics.span('ephemeris'):
+                    charts = chart_slice(*zip(*[job[1:] for job in chunk]))
+            except Exception as e:
+                print(f"❌ Chart batch failed: {e}")
+                for index, *_ in chunk:
+                    yield index, None, "Chart calculation failed"
+                continue
+            for (index, *_), chart in zip(chunk, charts):
+                yield index, chart, None
+        return
+
+    chunks = list(chunked(jobs, chunk_size))
+    pool = chart_pool()
+    try:
+        futures = {pool.submit(chart_slice, *zip(*[job[1:] for job in chunk])): chunk for chunk in chunks}
+    except BrokenProcessPool:
+        # נשבר בבקשה קודמת - pool חדש וניסיון אחד נוסף
+        discard_chart_pool(pool)
+        pool = chart_pool()
+        futures = {pool.submit(chart_slice, *zip(*[job[1:] for job in chunk])): chunk for chunk in chunks}
+
+    for future in as_completed(futures):
+        chunk = futures[future]
+        try:
+            charts = future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                discard_chart_pool(pool)
+            print(f"❌ Chart batch failed: {e}")
+            for index, *_ in chunk:
+                yield index, None, "Chart calculation failed"
+            continue
+        for (index, *_), chart in zip(chunk, charts):
+            yield index, chart, None
+
+@app.route('/api/charts', methods=['POST'])
+def api_charts():
+    """
+    מערך JSON של רשומות לידה ({name, birth_date, birth_time, latitude+longitude או city})
+    -> מפה לכל רשומה (planet, sign, degree_int, degree_total, house).
+    רשומה שגויה מקבלת error משלה ולא מפילה את כל הבקשה.
+    ?stream=1 (או Accept: application/x-ndjson) - שורת NDJSON לכל רשומה, לפי סדר הסיום.
+    """
+    records = request.get_json(silent=True)
+    if isinstance(records, dict):
+        records = records.get('records')
+    if not isinstance(records, list):
+        return jsonify({'error': 'Expected a JSON array of birth records'}), 400
+    limit = current_app.config['CHARTS_API_MAX_RECORDS']
+    if len(records) > limit:
+        return jsonify({'error': f'Too many records ({len(records)}), the limit is {limit} per request'}), 413
+
+    # פענוח וגיאוקודינג בתהליך הזה (עם המטמון), כל עיר פעם אחת
+    jobs, errors, cities = [], {}, {}
+    for index, rec in enumerate(records):
+        try:
+            jobs.append((index, *parse_chart_record(rec, cities)))
+        except ValueError as e:
+            errors[index] = str(e)
+
+    def item(index, chart=None, error=None):
+        rec = records[index]
+        name = rec.get('name') if isinstance(rec, dict) else None
+        if error is not None:
+            return {'index': index, 'name': name, 'error': error}
+        return {'index': index, 'name': name, 'chart': chart}
+
+    stream = (request.args.get('stream') in ('1', 'true')
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    if stream:
+        def generate():
+            for index, error in errors.items():
+                yield json.dumps(item(index, error=error)) + '\n'
+            for index, chart, error in chart_results(jobs):
+                yield json.dumps(item(index, chart, error)) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    results = [None] * len(records)
+    for index, error in errors.items():
+        results[index] = item(index, error=error)
+    for index, chart, error in chart_results(jobs):
+        results[index] = item(index, chart, error)
+    failed = sum(1 for r in results if 'error' in r)
+    return jsonify({'count': len(results), 'errors': failed, 'results': results})
+
+# === השלמה אוטומטית של ערים ===
+@app.route('/api/cities')
+def api_cities():
+    index = city_index()
+    if index is None:
+        return jsonify({'error': 'No gazetteer configured'}), 404
+    try:
+        limit = min(max(int(request.args.get('limit', 8)), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    response = jsonify({'cities': index.search(request.args.get('q', ''), limit=limit)})
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+# === חיפוש בטקסטים ===
+SEARCH_KINDS = ('degree', 'sign', 'house')
+
+def run_search():
+    query = (request.args.get('q') or '').strip()
+    kinds = [k for k in request.args.getlist('kind') if k in SEARCH_KINDS] or None
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    results = content_search.search(query, limit=limit, kinds=kinds) if query else []
+    for r in results:
+        if r['kind'] == 'degree':
+            r['url'] = url_for('research', sign=r['key']['sign'], degree=r['key']['degree'])
+    return query, results
+
+@app.route('/search')
+def search():
+    query, results = run_search()
+    return render_template('search.html', query=query, results=results)
+
+@app.route('/api/search')
+def api_search():
+    query, results = run_search()
+    return jsonify({'query': query, 'results': results})
+
+# === SYNASTRY: התאמה בין נשמות ===
+# מטריצת המיקומים נשמרת בזיכרון (לכל מופע של האפליקציה - לכל אחד מסד משלו)
+# עד שגרסת 'placements' עולה (כל כתיבה ל-Placement)
+def synastry_matrix():
+    """(user_ids, longitudes) - שורה לכל משתמש עם מפה מלאה, עמודה לכל CHART_POINTS"""
+    _synastry_matrix = current_app.extensions.setdefault('synastry_matrix', {})
+    signature = data_version('placements')
+    if _synastry_matrix.get('signature') != signature:
+        rows = db.session.query(Placement.user_id, Placement.body, Placement.longitude).all()
+        column = {name: j for j, name in enumerate(CHART_POINTS)}
+        user_ids, row_idx = np.unique(np.array([r[0] for r in rows], dtype=np.int64), return_inverse=True)
+        lons = np.full((len(user_ids), len(CHART_POINTS)), np.nan)
+        lons[row_idx, [column[r[1]] for r in rows]] = [r[2] for r in rows]
+        complete = ~np.isnan(lons).any(axis=1)
+        _synastry_matrix.update(signature=signature, user_ids=user_ids[complete], lons=lons[complete])
+    return _synastry_matrix['user_ids'], _synastry_matrix['lons']
+
+@app.route('/api/synastry/<int:user_id>')
+def synastry_matches(user_id):
+    user = User.query.get_or_404(user_id)
+    try:
+        k = min(max(int(request.args.get('k', 10)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'Invalid k'}), 400
+
+    user_ids, lons = synastry_matrix()
+    pos = np.searchsorted(user_ids, user.id)
+    if pos >= len(user_ids) or user_ids[pos] != user.id:
+        return jsonify({'error': 'No placements stored for this user'}), 404
+
+    indices, scores = synastry.top_k(lons, k=k, rows=[pos])
+    partner_ids = [int(user_ids[j]) for j in indices[0] if j >= 0]
+    names = dict(db.session.query(User.id, User.name).filter(User.id.in_(partner_ids)).all())
+    matches = [{
+        'user_id': int(user_ids[j]), 'name': names.get(int(user_ids[j]), ''),
+        'score': round(float(score), 3),
+        'aspects': synastry.aspect_details(lons[pos], lons[j]),
+    } for j, score in zip(indices[0], scores[0]) if j >= 0]
+    return jsonify({'user_id': user.id, 'name': user.name, 'matches': matches})
+
+# === קבצים עם טביעת אצבע (Cache-Control: immutable) ===
+@app.route('/assets/<digest>/<path:filename>')
+def fingerprinted_asset(digest, filename):
+    current = asset_manifest.digests.get(filename)
+    if current is None:
+        abort(404)
+    if digest != current:
+        # קישור ישן לקובץ שהשתנה - מפנים לגרסה הנוכחית
+        return redirect(url_for('fingerprinted_asset', digest=current, filename=filename))
+
+    response = send_from_directory(app.static_folder, filename, etag=current)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+# === ייצוא כל הנשמות עם המפות שלהן (CSV / NDJSON / Parquet) ===
+app.config['EXPORT_CHUNK_SIZE'] = int(os.environ.get('EXPORT_CHUNK_SIZE', 1000))
+
+def export_chunks(chunk_size, fast=False):
+    """
+    מנות של (user dict, chart) לפי סדר id. השורות נשלפות מ-cursor פתוח (yield_per),
+    וכל מנה מחושבת ב-compute_charts אחד - הזיכרון לא תלוי בגודל הטבלה.
+    fast: מיקומי הכוכבים מטבלת האפמריס (אם נבנתה), האופק והבתים תמיד מדויקים.
+    """
+    table = ephemeris_table.active() if fast else None
+    columns = [getattr(User, c) for c in souls_export.USER_COLUMNS]
+    result = db.session.execute(db.select(*columns).order_by(User.id)
+                                .execution_options(yield_per=chunk_size))
+    for partition in result.mappings().partitions():
+        users = [dict(row) for row in partition]
+        jds, computable = [], []
+        for i, user in enumerate(users):
+            jd = user['julian_day']
+            if jd is None:
+                # שורה ישנה שעדיין לא נורמלה - מחשבים בלי לכתוב ל-DB
+                try:
+                    jd = birth_julian_day(user['birth_date'], user['birth_time'], user['latitude'], user['longitude'])
+                except (ValueError, TypeError, IndexError):
+                    continue
+            jds.append(jd)
+            computable.append(i)
+
+        charts = [None] * len(users)
+        if computable:
+            batch = compute_charts(jds, [users[i]['latitude'] for i in computable],
+                                   [users[i]['longitude'] for i in computable], table=table)
+            for j, i in enumerate(computable):
+                charts[i] = batch.chart(j)
+        yield list(zip(users, charts))
+
+@app.route('/api/export')
+def export_souls_api():
+    fmt = request.args.get('format', 'csv')
+    try:
+        souls_export.check_format(fmt)
+        chunk_size = int(request.args.get('chunk_size', current_app.config['EXPORT_CHUNK_SIZE']))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    chunk_size = min(max(chunk_size, 1), 10000)
+    fast = request.args.get('fast') in ('1', 'true')
+
+    response = Response(stream_with_context(souls_export.encode(fmt, export_chunks(chunk_size, fast))),
+                        mimetype=souls_export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="souls.{fmt}"'
+    return response
+
+# === API לסטטיסטיקות המטמון ===
+@app.route('/api/cache_stats')
+def cache_stats():
+    return jsonify({'charts': chart_cache.stats(), 'geocoding': geocoder.stats(),
+                    'timezones': timezone_resolver.stats(), 'fragments': fragment_cache.stats()})
+
+# === מדדים בפורמט Prometheus ===
+@app.route('/metrics')
+def prometheus_metrics():
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# === פקודות תחזוקה (flask --app app <command>) ===
+@app.cli.command('backfill-placements')
+@click.option('--chunk-size', default=1000, show_default=True, help='Charts per batch.')
+def backfill_placements(chunk_size):
+    """
+    מחשב מחדש את טבלת המיקומים עבור כל המשתמשים הקיימים. כל מנה מוחלפת בטרנזקציה
+    משלה (מחיקה + הכנסה + מונים), כך ש-/research והמונים שלמים לאורך כל הריצה,
+    וריצה שנכשלה באמצע משאירה כל משתמש עם המיקומים הישנים או החדשים שלו.
+    """
+    count, elapsed, last_id = 0, 0.0, 0
+
+    while True:
+        # דפדוף לפי id - לא טוענים את כל הטבלה לזיכרון
+        users = User.query.filter(User.id > last_id).order_by(User.id).limit(chunk_size).all()
+        if not users:
+            break
+        last_id = users[-1].id
+
+        charts, seconds = replace_placements(users)
+        count += charts
+        elapsed += seconds
+        db.session.commit()
+        db.session.expunge_all()
+
+    # מיקומים שנשארו ממשתמשים שכבר לא קיימים
+    orphans = [row[0] for row in db.session.query(Placement.user_id).distinct()
+               .filter(~Placement.user_id.in_(db.session.query(User.id)))]
+    if orphans:
+        remove_placements(*orphans)
+        db.session.commit()
+    # המונים עודכנו לאורך הדרך; ספירה מחדש מתקנת סטייה שהייתה עוד לפני הריצה
+    rebuild_population_stats()
+
+    rate = count / elapsed if elapsed else 0.0
+    print(f"✅ Rebuilt placements for {count} users ({rate:.0f} charts/sec)")
+
+@app.cli.command('rebuild-population-stats')
+def rebuild_population_stats_command():
+    """בונה מחדש את מוני האוכלוסייה מטבלת המיקומים"""
+    start = time.perf_counter()
+    rebuild_population_stats()
+    print(f"✅ Rebuilt population stats in {time.perf_counter() - start:.2f}s")
+
+@app.cli.command('backfill-birth-times')
+@click.option('--all', 'redo_all', is_flag=True, help='Recompute every user, not only rows missing julian_day.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Users per transaction.')
+def backfill_birth_times(redo_all, chunk_size):
+    """
+    ממיר את birth_date/birth_time של משתמשים קיימים לזמן UTC, Julian Day ואיזור זמן,
+    ומחשב מחדש את המיקומים (והמונים) של כל משתמש שה-jd שלו השתנה - באותה טרנזקציה
+    """
+    query = User.query.order_by(User.id)
+    if not redo_all:
+        query = query.filter(User.julian_day.is_(None))
+    converted, failed, refreshed, last_id = 0, 0, 0, 0
+    start = time.perf_counter()
+
+    while True:
+        # דפדוף לפי id (ולא offset - בלי --all השורות שטופלו כבר יוצאות מהסינון)
+        users = query.filter(User.id > last_id).limit(chunk_size).all()
+        if not users:
+            break
+        last_id = users[-1].id
+
+        parsed = []
+        for user in users:
+            if not coordinates_in_range(user.latitude, user.longitude):
+                print(f"⚠️ Could not normalize birth time of user {user.id}: "
+                      f"coordinates out of range ({user.latitude}, {user.longitude})")
+                failed += 1
+                continue
+            try:
+                parsed.append((user, local_birth_datetime(user.birth_date, user.birth_time)))
+            except (ValueError, TypeError, AttributeError) as e:
+                print(f"⚠️ Could not normalize birth time of user {user.id}: {e}")
+                failed += 1
+
+        changed = []
+        normalized = normalize_births((local_dt, user.latitude, user.longitude) for user, local_dt in parsed)
+        for (user, _), fields in zip(parsed, normalized):
+            if user.julian_day != fields['julian_day']:
+                changed.append(user)
+            for key, value in fields.items():
+                setattr(user, key, value)
+        if changed:
+            replace_placements(changed)
+        converted += len(parsed)
+        refreshed += len(changed)
+        db.session.commit()
+        db.session.expunge_all()
+
+    print(f"✅ Normalized birth times of {converted} users in {time.perf_counter() - start:.1f}s"
+          + (f" ({failed} could not be parsed)" if failed else ""))
+    if refreshed:
+        # המפות הישנות חושבו משעון מקומי כאילו הוא UTC
+        chart_cache.clear()
+        print(f"   Recomputed the placements of {refreshed} users whose Julian day changed.")
+
+@app.cli.command('export-souls')
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(list(souls_export.FORMATS)),
+              help='Output format (default: from the file extension, else csv).')
+@click.option('--chunk-size', default=1000, show_default=True, help='Souls per chart batch.')
+@click.option('--fast', is_flag=True, help='Body positions from the daily ephemeris table (~0.001 degree).')
+def export_souls_command(output, fmt, chunk_size, fast):
+    """כותב את כל הנשמות עם 12 המיקומים שלהן לקובץ, מנה אחרי מנה"""
+    fmt = fmt or souls_export.format_for(output)
+    try:
+        souls_export.check_format(fmt)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    count = 0
+    def counted(chunks):
+        nonlocal count
+        for chunk in chunks:
+            count += len(chunk)
+            yield chunk
+
+    start = time.perf_counter()
+    with open(output, 'wb') as f:
+        for data in souls_export.encode(fmt, counted(export_chunks(chunk_size, fast))):
+            f.write(data)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Exported {count} souls to '{output}' ({fmt}) in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} souls/sec)")
+
+@app.cli.command('build-ephemeris-table')
+@click.option('--start', 'start_year', default=1900, show_default=True, help='First year covered.')
+@click.option('--end', 'end_year', default=2100, show_default=True, help='Last year covered.')
+def build_ephemeris_table(start_year, end_year):
+    """בונה את טבלת המיקומים היומית (מיפוי לזיכרון) עבור מצב המיקומים המהירים"""
+    path = current_app.config['EPHEMERIS_TABLE_PATH']
+    result = ephemeris_table.build(path, start_year, end_year)
+    print(f"✅ Wrote {result['days']} days x {len(ephemeris_table.BODY_NAMES)} bodies "
+          f"({result['bytes'] / 1e6:.1f} MB) to '{path}' in {result['seconds']}s")
+
+@app.cli.command('validate-ephemeris-table')
+@click.option('--samples', default=20000, show_default=True, help='Random moments checked against swe.')
+def validate_ephemeris_table(samples):
+    """דו"ח שגיאה מקסימלית של הטבלה מול Swiss Ephemeris, לכל גוף"""
+    table = ephemeris_table.active()
+    if table is None:
+        raise click.ClickException(f"No ephemeris table at '{current_app.config['EPHEMERIS_TABLE_PATH']}' "
+                                   "- run build-ephemeris-table first")
+    print(f"{'body':<12}{'max err °':>12}{'mean err °':>12}{'linear max °':>14}{'degree diff':>13}")
+    for body, r in table.validate(samples).items():
+        print(f"{body:<12}{r['max_error_deg']:>12.6f}{r['mean_error_deg']:>12.7f}"
+              f"{r['linear_max_error_deg']:>14.6f}{r['degree_mismatch_rate']:>12.3%}")
+
+@app.cli.command('import-souls')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=500, show_default=True, help='Users per transaction.')
+@click.option('--workers', default=None, type=int, help='Chart worker processes (default: CPU count).')
+def import_souls_command(path, batch_size, workers):
+    """מייבא קובץ CSV/XLSX של נשמות (name, city, birth_date, birth_time[, latitude, longitude])"""
+    progress = None
+    for progress in import_souls(read_records(path, path), batch_size=batch_size, workers=workers):
+        for err in progress['errors']:
+            print(f"⚠️ Row {err['row']}: {err['error']}")
+        print(f"... {progress['imported']} imported, {progress['skipped']} skipped "
+              f"({progress['rows_per_sec']} rows/sec)")
+    if progress:
+        print(f"✅ Imported {progress['imported']} souls from '{path}' in {progress['elapsed']}s "
+              f"({progress['distinct_cities']} distinct cities geocoded)")
+    else:
+        print(f"⚠️ No records found in '{path}'")
+
+@app.cli.command('synastry-rank')
+@click.option('--k', default=5, show_default=True, help='Partners kept per soul.')
+@click.option('--top', default=20, show_default=True, help='Pairs printed.')
+@click.option('--workers', default=None, type=int, help='Worker processes (default: CPU count).')
+@click.option('--output', default=None, type=click.Path(dir_okay=False), help='Write all ranked pairs to a CSV file.')
+def synastry_rank(k, top, workers, output):
+    """מדרג את כל זוגות הנשמות לפי התאמה (היבטים בין המפות), top-k לכל נשמה"""
+    user_ids, lons = synastry_matrix()
+    start = time.perf_counter()
+    indices, scores = synastry.top_k(lons, k=k, workers=workers or os.cpu_count() or 1)
+    elapsed = time.perf_counter() - start
+    pairs = synastry.ranked_pairs(indices, scores)
+
+    names = dict(db.session.query(User.id, User.name).all())
+    for i, j, score in pairs[:top]:
+        print(f"{score:7.2f}  {names.get(int(user_ids[i]), '?')} (#{user_ids[i]}) + "
+              f"{names.get(int(user_ids[j]), '?')} (#{user_ids[j]})")
+    if output:
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['user_a', 'user_b', 'score'])
+            for i, j, score in pairs:
+                writer.writerow([int(user_ids[i]), int(user_ids[j]), round(score, 3)])
+    n = len(user_ids)
+    rate = n * (n - 1) / elapsed if elapsed else 0.0
+    print(f"✅ Ranked {len(pairs)} pairs across {n} souls in {elapsed:.1f}s ({rate:,.0f} chart pairs/sec)"
+          + (f" -> '{output}'" if output else ""))
+
+@app.cli.command('precompute-activations')
+@click.option('--date', 'day', default=None, help='YYYY-MM-DD (default: today, UTC).')
+@click.option('--orb', default=None, type=click.FloatRange(0, ACTIVATION_ORB_MAX, min_open=True),
+              help='Orb in degrees (default: ACTIVATION_ORB).')
+def precompute_activations(day, orb):
+    """מחשב מראש את ההפעלות של היום (להרצה יומית מ-cron), לפי מיקום הכוכבים ב-12:00 UTC"""
+    day = datetime.datetime.strptime(day, '%Y-%m-%d').date() if day else datetime.datetime.now(datetime.timezone.utc).date()
+    orb = orb if orb is not None else current_app.config['ACTIVATION_ORB']
+    start = time.perf_counter()
+
+    matches = find_activations(swe.julday(day.year, day.month, day.day, 12.0), orb)
+    DailyActivation.query.filter_by(day=day).delete()
+    if matches:
+        db.session.execute(db.insert(DailyActivation), [{
+            'day': day, 'transit_body': m['transit_body'], 'transit_longitude': m['transit_longitude'],
+            'user_id': m['user_id'], 'natal_body': m['natal_body'],
+            'natal_longitude': m['natal_longitude'], 'orb': m['orb'],
+        } for m in matches])
+    db.session.merge(DailyActivationRun(day=day, orb=orb, computed_at=datetime.datetime.now(datetime.timezone.utc)))
+    db.session.commit()
+    print(f"✅ {len(matches)} activations for {day} (orb {orb}°) in {time.perf_counter() - start:.2f}s")
+
+# === Application factory: מופע חדש עם config משלו (production, בדיקות, מופע נוסף) ===
+# מופעי האפליקציה בתהליך - לכולם צריך לסגור חיבורים לפני / אחרי fork
+_instances = [app]
+
+def create_app(config=None):
+    """
+    מופע Flask חדש: ה-config של המודול (מה-environment) ומעליו `config` (dict).
+    ה-routes והתבניות משותפים; מסד הנתונים (engine, טבלאות, pragmas) שייך למופע,
+    ו-views קוראים את ה-config שלהם דרך current_app. מטמונים ברמת התהליך (מפות,
+    גיאוקודר, HTML מרונדר, תוכן, אינדקסים) משותפים לכל המופעים.
+    """
+    instance = Flask(__name__, instance_path=app.instance_path)
+    instance.config.update(app.config)
+    instance.config.update(config or {})
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in (config or {}):
+        instance.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(instance.config)
+
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue # Flask מוסיף אותו בעצמו
+        instance.add_url_rule(rule.rule, endpoint=rule.endpoint, view_func=app.view_functions[rule.endpoint],
+                              methods=rule.methods - {'OPTIONS'})
+    instance.cli.commands.update(app.cli.commands)
+
+    db.init_app(instance)
+    configure_engine(instance)
+    with instance.app_context():
+        init_database()
+        metrics.init_app(instance, engine=db.engine)
+    _instances.append(instance)
+    return instance
+
+# === production: gunicorn -c gunicorn.conf.py wsgi:app ===
+_prepared_for_fork = False
+
+def prepare_for_fork(flask_app=app):
+    """
+    נקרא מ-wsgi.py על המופע שמוגש. המודול כבר טען בייבוא את התוכן, המניפסט
+    והטבלאות; כאן מחממים את מה שנטען בעצלות, כדי שכל זה יקרה פעם אחת לפני
+    ה-fork וה-workers יחלקו את הדפים (copy-on-write) במקום שכל אחד יבנה עותק
+    משלו. קריאה נוספת לא עושה כלום.
+    """
+    global _prepared_for_fork
+    if _prepared_for_fork:
+        return
+    timezone_resolver.preload()
+    content_search.preload()
+    city_index()
+    with flask_app.test_request_context(): # degree_entry בונה כתובות תמונה עם url_for
+        degree_bundle()
+        synastry_matrix() # ה-workers מתחילים עם המטריצה של הגרסה הנוכחית
+    # אף חיבור פתוח לא עובר ל-workers
+    for instance in _instances:
+        with instance.app_context():
+            db.engine.dispose()
+    # אובייקטים שנטענו עד כאן לא ייסרקו יותר ע"י ה-GC, כך שה-workers לא יכתבו לדפים שלהם
+    gc.collect()
+    gc.freeze()
+    _prepared_for_fork = True
+
+def reset_after_fork():
+    """נקרא מ-post_fork של gunicorn: חיבורי SQLite לא עוברים fork בבטחה"""
+    for instance in _instances:
+        with instance.app_context():
+            db.engine.dispose(close=False)
+    geocoder.reopen()
+    chart_cache.reopen()
 
 if __name__ == '__main__':
     # הרצת השרת בצורה פתוחה לרשת הביתית (לצפייה מהנייד)
-    app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
+    app.run(debug=not app.config['PRODUCTION'], port=5000, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,118 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+
+from data_loader import ZODIAC_SIGNS
+
+PLACEHOLDER_IMAGE_URL = "https://via.placeholder.com/400x600?text=No+Image"
+
+# Fingerprinted files never change under the same URL, so clients may keep them forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Written by image_variants.py (resized WebP/AVIF copies)
+VARIANTS_INDEX = 'derived/variants.json'
+
+# aries1.jpg, aqua12.jpg, aquarius11.jpg, taurus29(1).jpg ...
+DEGREE_IMAGE_RE = re.compile(r'^[a-z]+?(\d+)(\(\d+\))?\.(jpe?g|png|webp)$', re.IGNORECASE)
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class AssetManifest:
+    """
+    Built once at startup: maps (sign, degree) and sign icons to static paths
+    plus a content hash, so the request path never touches the filesystem.
+    The sign comes from the folder name and the degree from the trailing
+    number, which absorbs the irregular names (aqua12.jpg vs aquarius11.jpg).
+    """
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.degree_images = {}
+        self.sign_icons = {}
+        self.digests = {}
+        self.variants = {}
+        self.version = None
+        self.updated_at = None
+        self.build()
+
+    def build(self):
+        degree_images, sign_icons, digests = {}, {}, {}
+        duplicates = {}
+
+        images_root = os.path.join(self.static_folder, 'degree_images')
+        for sign in ZODIAC_SIGNS:
+            folder = os.path.join(images_root, sign.lower())
+            if not os.path.isdir(folder):
+                continue
+            for filename in sorted(os.listdir(folder)):
+                match = DEGREE_IMAGE_RE.match(filename)
+                if not match:
+                    continue
+                degree = int(match.group(1))
+                key = (sign, degree)
+                # Prefer 'taurus29.jpg' over a 'taurus29(1).jpg' copy
+                is_copy = bool(match.group(2))
+                if key in degree_images and (is_copy or not duplicates[key]):
+                    continue
+                degree_images[key] = f"degree_images/{sign.lower()}/{filename}"
+                duplicates[key] = is_copy
+
+        for sign in ZODIAC_SIGNS:
+            rel_path = f"zodiac_icons/{sign.lower()}.png"
+            if os.path.exists(os.path.join(self.static_folder, rel_path)):
+                sign_icons[sign] = rel_path
+
+        for rel_path in list(degree_images.values()) + list(sign_icons.values()):
+            digests[rel_path] = file_digest(os.path.join(self.static_folder, rel_path))
+
+        # Derived variants are only used while they still match their source image
+        variants = {}
+        for rel_path, entry in self._load_variants_index().items():
+            if digests.get(rel_path) != entry['source_digest']:
+                continue
+            by_format = {}
+            for v in entry['variants']:
+                digests[v['path']] = v['digest']
+                by_format.setdefault(v['format'], []).append((v['path'], v['width']))
+            variants[rel_path] = by_format
+
+        # Changes whenever any managed file changes (used in HTTP validators)
+        version = hashlib.sha1()
+        for rel_path in sorted(digests):
+            version.update(f"{rel_path}={digests[rel_path]};".encode())
+        mtimes = [os.path.getmtime(os.path.join(self.static_folder, rel_path)) for rel_path in digests
+                  if os.path.exists(os.path.join(self.static_folder, rel_path))]
+
+        self.degree_images, self.sign_icons, self.digests = degree_images, sign_icons, digests
+        self.variants = variants
+        self.version = version.hexdigest()[:12]
+        self.updated_at = datetime.datetime.fromtimestamp(max(mtimes, default=0), datetime.timezone.utc)
+
+    def _load_variants_index(self):
+        path = os.path.join(self.static_folder, VARIANTS_INDEX)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable image variants index: {e}")
+            return {}
+
+    def srcset_entries(self, rel_path):
+        """{format: [(variant_path, width), ...]} for a managed image, {} if none were built."""
+        return self.variants.get(rel_path, {})
+
+    def degree_image_path(self, sign, degree):
+        return self.degree_images.get((sign, degree))
+
+    def sign_icon_path(self, sign):
+        return self.sign_icons.get(sign)
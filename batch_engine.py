@@ -0,0 +1,105 @@
+import os
+import time
+import numpy as np
+import swisseph as swe
+
+from data_loader import ZODIAC_SIGNS
+
+# Swiss Ephemeris data files (sepl_18.se1 ...); without them swisseph falls back to
+# its built-in Moshier ephemeris. Set once here, for the app and for pool workers alike.
+EPHE_PATH = os.environ.get('SE_EPHE_PATH', '/usr/share/swisseph:/usr/local/share/swisseph')
+swe.set_ephe_path(EPHE_PATH)
+
+# --- Constants ---
+# Bodies in the order they appear on a chart (after the Ascendant)
+BODIES = [
+    ('Sun', swe.SUN), ('Moon', swe.MOON), ('Mercury', swe.MERCURY),
+    ('Venus', swe.VENUS), ('Mars', swe.MARS), ('Jupiter', swe.JUPITER),
+    ('Saturn', swe.SATURN), ('Uranus', swe.URANUS), ('Neptune', swe.NEPTUNE),
+    ('Pluto', swe.PLUTO), ('North Node', swe.MEAN_NODE)
+]
+
+# Column names of the arrays returned by compute_charts
+CHART_POINTS = ['Ascendant'] + [name for name, _ in BODIES]
+
+
+class ChartBatch:
+    """
+    Result of compute_charts: one row per chart, one column per CHART_POINTS entry.
+    """
+    def __init__(self, longitudes, cusps, elapsed):
+        self.longitudes = longitudes
+        self.cusps = cusps
+        self.sign_idx = (longitudes // 30).astype(np.int64) % 12
+        self.degree_int = (longitudes % 30).astype(np.int64) + 1
+        self.houses = assign_houses(longitudes, cusps)
+        self.elapsed = elapsed
+
+    def __len__(self):
+        return len(self.longitudes)
+
+    @property
+    def charts_per_second(self):
+        return len(self) / self.elapsed if self.elapsed > 0 else float('inf')
+
+    def chart(self, i):
+        """Row i as the list of dicts used by the templates (same shape as app.compute_chart)."""
+        return [{
+            'planet': name,
+            'sign': ZODIAC_SIGNS[self.sign_idx[i, j]],
+            'degree_total': float(self.longitudes[i, j]),
+            'degree_int': int(self.degree_int[i, j]),
+            'house': int(self.houses[i, j])
+        } for j, name in enumerate(CHART_POINTS)]
+
+
+def assign_houses(longitudes, cusps):
+    """
+    Vectorized cusp search. longitudes is (N, K), cusps is (N, 12).
+    Every row of cusps is rotated so house 1 starts at 0, which removes the
+    360 -> 0 wrap, and rows are laid end to end (row i lives in [360*i, 360*(i+1)))
+    so a single np.searchsorted answers all N*K lookups.
+    """
+    n = len(cusps)
+    rows = np.arange(n)[:, None]
+    start = cusps[:, :1]
+    rel_cusps = (cusps - start) % 360.0 + rows * 360.0
+    rel_lons = (longitudes - start) % 360.0 + rows * 360.0
+    idx = np.searchsorted(rel_cusps.ravel(), rel_lons.ravel(), side='right')
+    return idx.reshape(longitudes.shape) - rows * 12
+
+
+def compute_charts(jds, lats, lons, hsys=b'P', table=None):
+    """
+    Computes N charts at once. Returns a ChartBatch with (N, 12) arrays of
+    longitudes, sign indices, 1-based degrees and house numbers.
+    With an ephemeris_table.EphemerisTable, body longitudes are interpolated from it
+    (fast, ~0.001 degree) instead of calling swe per body and date; the Ascendant and
+    house cusps always come from swe.houses.
+    """
+    start_time = time.perf_counter()
+    jds = np.asarray(jds, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    n = len(jds)
+
+    longitudes = np.empty((n, len(CHART_POINTS)))
+    cusps = np.empty((n, 12))
+
+    # Houses depend on time and place
+    for i in range(n):
+        h_cusps, ascmc = swe.houses(jds[i], lats[i], lons[i], hsys)
+        cusps[i] = h_cusps[:12]
+        longitudes[i, 0] = ascmc[0]
+
+    # Body positions depend on time only - compute each distinct moment once
+    unique_jds, inverse = np.unique(jds, return_inverse=True)
+    if table is not None:
+        longitudes[:, 1:] = table.longitudes(unique_jds)[inverse]
+        return ChartBatch(longitudes, cusps, time.perf_counter() - start_time)
+    for j, (_, body_id) in enumerate(BODIES, start=1):
+        positions = np.fromiter((swe.calc_ut(jd, body_id)[0][0] for jd in unique_jds),
+                                dtype=float, count=len(unique_jds))
+        longitudes[:, j] = positions[inverse]
+
+    return ChartBatch(longitudes, cusps, time.perf_counter() - start_time)
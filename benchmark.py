@@ -0,0 +1,255 @@
+"""
+Reproducible benchmarks for chart computation, research scans and startup.
+
+    python benchmark.py                                   # 1k/10k/100k souls -> bench_output.json
+    python benchmark.py --sizes 1000 --repeat 20
+    python benchmark.py --compare baseline.json --threshold 0.2
+
+Every table size runs in a fresh subprocess against a temporary SQLite database,
+with Nominatim replaced by a local stub, so nothing touches the network or the
+real souls.db. --compare exits with status 1 when any p50 (or startup time) grew by more than
+--threshold (0.2 = 20%) against the baseline file.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Synthetic birth places, also written out as the offline geocoder's data
+STUB_CITIES = {
+    'Jerusalem, Israel': (31.7788, 35.2258), 'Tel Aviv, Israel': (32.0853, 34.7818),
+    'Calgary, Canada': (51.0456, -114.0575), 'Toronto, Canada': (43.6535, -79.3839),
+    'London, UK': (51.5074, -0.1278), 'New York, USA': (40.7128, -74.0060),
+    'Buenos Aires, Argentina': (-34.6037, -58.3816), 'Tokyo, Japan': (35.6762, 139.6503),
+    'Reykjavik, Iceland': (64.1466, -21.9426), 'Sydney, Australia': (-33.8688, 151.2093),
+}
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def synthetic_souls(count, seed=42):
+    rng = random.Random(seed)
+    cities = list(STUB_CITIES.items())
+    for i in range(count):
+        city, (lat, lon) = rng.choice(cities)
+        yield {
+            'name': f"soul {i}", 'city': city,
+            'birth_date': f"{rng.randint(1930, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'birth_time': f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            'latitude': lat, 'longitude': lon,
+        }
+
+
+# --- runs inside the per-size subprocess ---
+
+def run_size(size, repeat):
+    import app as app_module
+    from app import (app, db, User, Placement, compute_charts, placement_rows, birth_fields, chart_cache,
+                     fragment_cache, update_population_stats)
+    from data_loader import ZODIAC_SIGNS
+
+    results = {}
+    with app.app_context():
+        start = time.perf_counter()
+        rows = list(synthetic_souls(size))
+        for offset in range(0, size, 5000):
+            chunk = [dict(r, **birth_fields(r['birth_date'], r['birth_time'], r['latitude'], r['longitude']))
+                     for r in rows[offset:offset + 5000]]
+            db.session.execute(db.insert(User), chunk)
+            db.session.flush()
+            ids = [u.id for u in User.query.order_by(User.id).offset(offset).limit(len(chunk))]
+            batch = compute_charts([r['julian_day'] for r in chunk],
+                                   [r['latitude'] for r in chunk], [r['longitude'] for r in chunk])
+            placements = [row for i, user_id in enumerate(ids) for row in placement_rows(user_id, batch.chart(i))]
+            db.session.execute(db.insert(Placement), placements)
+            update_population_stats(placements)
+            db.session.commit()
+        elapsed = time.perf_counter() - start
+        results['populate'] = {'rows': size, 'seconds': round(elapsed, 2),
+                               'rows_per_sec': round(size / elapsed, 1)}
+
+    rng = random.Random(7)
+    client = app.test_client()
+    soul = lambda: rng.choice(rows)
+
+    def chart_once():
+        chart_cache.clear()
+        r = soul()
+        app_module.calculate_chart_data(r['name'], r['city'], r['birth_date'], r['birth_time'])
+
+    def profile_cold():
+        # Both tiers, otherwise a repeat id is served as cached HTML without computing anything
+        chart_cache.clear()
+        fragment_cache.clear()
+        client.get(f"/profile/{rng.randint(1, size)}")
+
+    def profile_warm():
+        client.get("/profile/1")
+
+    def research():
+        client.get(f"/research?sign={rng.choice(ZODIAC_SIGNS)}&degree={rng.randint(1, 30)}")
+
+    def degree_data():
+        client.get(f"/api/degree_data?sign={rng.choice(ZODIAC_SIGNS)}&degree={rng.randint(1, 30)}")
+
+    results['calculate_chart_data'] = timed(chart_once, repeat)
+    results['profile_cold'] = timed(profile_cold, repeat)
+    client.get("/profile/1")
+    results['profile_warm'] = timed(profile_warm, repeat)
+    results['research'] = timed(research, repeat)
+    results['api_degree_data'] = timed(degree_data, repeat)
+    return results
+
+
+def measure_startup(env, snapshot):
+    """Cold import of data_loader in a fresh interpreter: wall time and peak RSS."""
+    code = (
+        "import time, resource, io, contextlib\n"
+        "start = time.perf_counter()\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    import data_loader\n"
+        "elapsed = time.perf_counter() - start\n"
+        "import json, sys\n"
+        "print(json.dumps({'seconds': round(elapsed, 4),"
+        " 'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),"
+        " 'pandas_loaded': 'pandas' in sys.modules}))\n"
+    )
+    env = dict(env)
+    if not snapshot:
+        # Point at a fresh, missing snapshot so the Excel fallback runs
+        env['CONTENT_SNAPSHOT_PATH'] = os.path.join(tempfile.mkdtemp(), 'missing.db')
+    runs = 2 if snapshot else 1  # the first run (re)builds a stale or missing snapshot
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', code], cwd=HERE, env=env,
+                             capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+# --- driver ---
+
+def bench_env(workdir):
+    stub_path = os.path.join(workdir, 'geocoder_stub.json')
+    with open(stub_path, 'w', encoding='utf-8') as f:
+        json.dump(STUB_CITIES, f)
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'souls.db')}",
+        'GEOCODER_OFFLINE_FILE': stub_path,
+        'GEOCODE_CACHE_PATH': os.path.join(workdir, 'geocode_cache.db'),
+    })
+    env.pop('CHART_CACHE_PATH', None)
+    return env
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    regressions = []
+    for group, metrics in results.items():
+        for name, value in metrics.items():
+            old = baseline.get(group, {}).get(name) or {}
+            key = 'p50_ms' if 'p50_ms' in value else 'seconds'
+            if not old.get(key) or key not in value:
+                continue
+            change = value[key] / old[key] - 1
+            marker = '❌' if change > threshold else '  '
+            print(f"{marker} {group}/{name} ({key}): {old[key]} -> {value[key]} ({change:+.0%})")
+            if change > threshold:
+                regressions.append(f"{group}/{name}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma separated souls table sizes')
+    parser.add_argument('--repeat', type=int, default=50, help='timed iterations per measurement')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--compare', metavar='BASELINE', help='baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown (0.2 = 20%%)')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        # Child process: everything printed by the app goes to stderr, the result to stdout
+        real_stdout, sys.stdout = sys.stdout, sys.stderr
+        result = run_size(args.run_size, args.repeat)
+        sys.stdout = real_stdout
+        print(json.dumps(result))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        env = bench_env(workdir)
+        results['startup'] = {
+            'load_astro_content_snapshot': measure_startup(env, snapshot=True),
+            'load_astro_content_excel': measure_startup(env, snapshot=False),
+        }
+        print(f"startup: {json.dumps(results['startup'])}")
+
+        for size in [int(s) for s in args.sizes.split(',') if s]:
+            db_path = os.path.join(workdir, 'souls.db')
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            proc = subprocess.run([sys.executable, __file__, '--run-size', str(size), '--repeat', str(args.repeat)],
+                                  cwd=HERE, env=env, stdout=subprocess.PIPE, text=True, check=True)
+            results[f"souls_{size}"] = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"souls_{size}: {json.dumps(results[f'souls_{size}'])}")
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to '{args.output}'")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import csv
+import datetime
+import io
+import os
+from itertools import islice
+
+import numpy as np
+
+from batch_engine import compute_charts
+
+# Accepted spellings of each column (compared lower-cased, spaces -> underscores)
+COLUMN_ALIASES = {
+    'name': ('name', 'full_name'),
+    'city': ('city', 'birth_city', 'place', 'birth_place'),
+    'birth_date': ('birth_date', 'date', 'date_of_birth', 'dob'),
+    'birth_time': ('birth_time', 'time', 'time_of_birth'),
+    'latitude': ('latitude', 'lat'),
+    'longitude': ('longitude', 'lon', 'lng'),
+}
+
+
+def _canonical_columns(header):
+    lookup = {alias: field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    return [lookup.get(str(h or '').strip().lower().replace(' ', '_')) for h in header]
+
+
+def _normalize_record(raw):
+    """Turns Excel cell values (datetime, time, floats) into the strings the app stores."""
+    rec = {}
+    for field in COLUMN_ALIASES:
+        value = raw.get(field)
+        if isinstance(value, datetime.datetime) and field == 'birth_time':
+            value = value.time()
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            value = value.strftime('%Y-%m-%d')
+        elif isinstance(value, datetime.time):
+            value = value.strftime('%H:%M')
+        elif value is not None and field not in ('latitude', 'longitude'):
+            value = str(value).strip()
+        if field in ('latitude', 'longitude'):
+            try:
+                value = float(value) if value not in (None, '') else None
+            except (TypeError, ValueError):
+                value = None
+        rec[field] = value
+    return rec
+
+
+def _rows_to_records(rows):
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = _canonical_columns(header)
+    for row in rows:
+        if not any(cell not in (None, '') for cell in row):
+            continue
+        yield _normalize_record({c: v for c, v in zip(columns, row) if c})
+
+
+def read_records(stream, filename):
+    """
+    Streams birth records out of a CSV or XLSX file (path or binary file object),
+    one dict per row with the keys of COLUMN_ALIASES.
+    Raises ValueError right away for unsupported file types.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        return _read_xlsx(stream)
+    if ext == '.csv':
+        return _read_csv(stream)
+    raise ValueError(f"Unsupported file type '{ext}' (expected .csv or .xlsx)")
+
+
+def _read_xlsx(stream):
+    from openpyxl import load_workbook
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from _rows_to_records(workbook.active.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def _read_csv(stream):
+    if isinstance(stream, (str, os.PathLike)):
+        with open(stream, newline='', encoding='utf-8-sig') as f:
+            yield from _rows_to_records(csv.reader(f))
+    else:
+        yield from _rows_to_records(csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')))
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def chart_slice(jds, lats, lons):
+    """Process pool worker: charts for one slice of a batch."""
+    batch = compute_charts(jds, lats, lons)
+    return [batch.chart(i) for i in range(len(batch))]
+
+
+def parallel_charts(pool, jds, lats, lons, workers):
+    """Splits one batch across the pool and returns the charts in input order."""
+    if not jds:
+        return []
+    parts = max(1, min(workers, len(jds)))
+    slices = np.array_split(np.arange(len(jds)), parts)
+    futures = [pool.submit(chart_slice, [jds[i] for i in idx], [lats[i] for i in idx], [lons[i] for i in idx])
+               for idx in slices if len(idx)]
+    charts = []
+    for future in futures:
+        charts.extend(future.result())
+    return charts
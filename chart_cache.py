@@ -0,0 +1,194 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class ChartCache:
+    """
+    In-process LRU cache of computed charts, keyed on (julian day, lat, lon, house system).
+    Entries can be tagged with owners (user ids) so editing or deleting a user
+    drops everything computed for them. When disk_path is given, entries are also
+    written to a small SQLite file (at most disk_maxsize charts, least recently used
+    dropped first) so the cache survives restarts.
+    """
+    def __init__(self, maxsize=2048, disk_path=None, disk_maxsize=100000):
+        self.maxsize = maxsize
+        self.disk_maxsize = disk_maxsize
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()   # key -> chart
+        self._owners = {}               # owner -> {key, ...}
+        self._key_owners = {}           # key -> {owner, ...}, only for keys in _entries
+        self._lock = threading.Lock()
+        self.disk_path = disk_path
+        self._disk = None
+        self._disk_count = 0
+        self._disk_clock = 0
+        self.reopen()
+
+    def reopen(self):
+        """(Re)connects the disk tier - called again in each worker after a fork."""
+        if not self.disk_path:
+            return
+        with self._lock:
+            self._disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+            columns = {row[1] for row in self._disk.execute("PRAGMA table_info(chart_cache)")}
+            if 'owner' in columns:
+                # Older layout with a single owner column - it is only a cache, start over
+                self._disk.execute("DROP TABLE chart_cache")
+            self._disk.executescript(
+                "CREATE TABLE IF NOT EXISTS chart_cache ("
+                " key TEXT PRIMARY KEY, chart TEXT NOT NULL, used INTEGER NOT NULL DEFAULT 0);"
+                "CREATE INDEX IF NOT EXISTS ix_chart_cache_used ON chart_cache (used);"
+                "CREATE TABLE IF NOT EXISTS chart_cache_owner ("
+                " owner INTEGER NOT NULL, key TEXT NOT NULL, PRIMARY KEY (owner, key));"
+                "CREATE INDEX IF NOT EXISTS ix_chart_cache_owner_key ON chart_cache_owner (key);"
+            )
+            self._disk_count, self._disk_clock = self._disk.execute(
+                "SELECT COUNT(*), COALESCE(MAX(used), 0) FROM chart_cache").fetchone()
+            self._disk.commit()
+
+    @staticmethod
+    def make_key(jd, lat, lon, hsys=b'P'):
+        # Rounding keeps float noise (e.g. coordinates round-tripped through a form) from splitting entries
+        return (round(float(jd), 6), round(float(lat), 4), round(float(lon), 4), bytes(hsys).decode())
+
+    def get_or_compute(self, jd, lat, lon, compute, hsys=b'P', owner=None):
+        """Returns a fresh copy of the cached chart, calling compute() only on a miss."""
+        key = self.make_key(jd, lat, lon, hsys)
+        with self._lock:
+            chart = self._get(key)
+            if chart is not None:
+                self.hits += 1
+                if owner is not None and owner not in self._key_owners.get(key, ()):
+                    self._tag(key, owner)
+                return _copy_chart(chart)
+            self.misses += 1
+
+        chart = compute()
+        with self._lock:
+            self._put(key, chart, owner)
+        return _copy_chart(chart)
+
+    def invalidate_owner(self, owner):
+        with self._lock:
+            for key in self._owners.pop(owner, ()):
+                self._entries.pop(key, None)
+                self._forget(key, skip=owner)
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM chart_cache WHERE key IN "
+                                   "(SELECT key FROM chart_cache_owner WHERE owner = ?)", (owner,))
+                self._disk.execute("DELETE FROM chart_cache_owner WHERE key NOT IN (SELECT key FROM chart_cache)")
+                self._disk_count = self._disk.execute("SELECT COUNT(*) FROM chart_cache").fetchone()[0]
+                self._disk.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self._key_owners.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM chart_cache")
+                self._disk.execute("DELETE FROM chart_cache_owner")
+                self._disk_count = 0
+                self._disk.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'owners': len(self._owners),
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'disk_enabled': self._disk is not None,
+                'disk_size': self._disk_count,
+                'disk_maxsize': self.disk_maxsize,
+            }
+
+    # --- internals (caller holds the lock) ---
+
+    def _get(self, key):
+        chart = self._entries.get(key)
+        if chart is not None:
+            self._entries.move_to_end(key)
+            return chart
+        if self._disk is None:
+            return None
+        disk_key = json.dumps(key)
+        row = self._disk.execute("SELECT chart FROM chart_cache WHERE key = ?", (disk_key,)).fetchone()
+        if row is None:
+            return None
+        self.disk_hits += 1
+        self._disk_clock += 1
+        self._disk.execute("UPDATE chart_cache SET used = ? WHERE key = ?", (self._disk_clock, disk_key))
+        owners = [r[0] for r in self._disk.execute("SELECT owner FROM chart_cache_owner WHERE key = ?", (disk_key,))]
+        self._disk.commit()
+        chart = json.loads(row[0])
+        self._remember(key, chart, owners)
+        return chart
+
+    def _put(self, key, chart, owner):
+        self._remember(key, chart, [] if owner is None else [owner])
+        if self._disk is not None:
+            disk_key = json.dumps(key)
+            self._disk_clock += 1
+            inserted = self._disk.execute(
+                "INSERT OR IGNORE INTO chart_cache (key, chart, used) VALUES (?, ?, ?)",
+                (disk_key, json.dumps(chart), self._disk_clock)).rowcount
+            self._disk_count += inserted
+            if owner is not None:
+                self._disk.execute("INSERT OR IGNORE INTO chart_cache_owner (owner, key) VALUES (?, ?)",
+                                   (owner, disk_key))
+            if self._disk_count > self.disk_maxsize:
+                self._prune_disk()
+            self._disk.commit()
+
+    def _prune_disk(self):
+        # Drop the least recently used tenth at once, so pruning doesn't run on every insert
+        excess = self._disk_count - self.disk_maxsize + max(1, self.disk_maxsize // 10)
+        self._disk.execute("DELETE FROM chart_cache WHERE key IN "
+                           "(SELECT key FROM chart_cache ORDER BY used LIMIT ?)", (excess,))
+        self._disk.execute("DELETE FROM chart_cache_owner WHERE key NOT IN (SELECT key FROM chart_cache)")
+        self._disk_count = self._disk.execute("SELECT COUNT(*) FROM chart_cache").fetchone()[0]
+
+    def _remember(self, key, chart, owners):
+        self._entries[key] = chart
+        self._entries.move_to_end(key)
+        for owner in owners:
+            self._link(key, owner)
+        while len(self._entries) > self.maxsize:
+            evicted, _ = self._entries.popitem(last=False)
+            self._forget(evicted)
+
+    def _link(self, key, owner):
+        self._owners.setdefault(owner, set()).add(key)
+        self._key_owners.setdefault(key, set()).add(owner)
+
+    def _forget(self, key, skip=None):
+        """Unlinks an entry that left memory from all of its owners."""
+        for owner in self._key_owners.pop(key, ()):
+            if owner == skip:
+                continue
+            keys = self._owners.get(owner)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._owners[owner]
+
+    def _tag(self, key, owner):
+        self._link(key, owner)
+        if self._disk is not None:
+            self._disk.execute("INSERT OR IGNORE INTO chart_cache_owner (owner, key) VALUES (?, ?)",
+                               (owner, json.dumps(key)))
+            self._disk.commit()
+
+
+def _copy_chart(chart):
+    # Callers enrich the dicts in place (texts, image urls), so never hand out the cached ones
+    return [dict(p) for p in chart]
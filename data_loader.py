@@ -1,5 +1,9 @@
-import pandas as pd
+import datetime
+import hashlib
 import os
+import sqlite3
+
+from search_index import content_documents, build_index, write_index
 
 # --- קבועים ---
 ZODIAC_SIGNS = ['Aries', 'Taurus', 'Gemini', 'Cancer', 'Leo', 'Virgo', 
@@ -15,20 +19,52 @@ def clean_planet_name(raw_name):
     clean = str(raw_name).strip().title()
     return PLANET_NAME_FIXES.get(clean, clean)
 
+# --- קבצי המקור ---
+MAIN_EXCEL_NAMES = ['planets in signs.xlsx']
+SENTENCE_EXCEL_NAMES = ['degree sentances.xlsx', 'degree sentences.xlsx', 'Degree Sentences.xlsx']
+INSIDE_EXCEL_NAMES = ['inside_degrees_final.xlsx', 'Inside_Degrees_Final.xlsx', 'inside degrees final.xlsx']
+
+# קובץ ה-snapshot המקומפל (SQLite) - נבנה אוטומטית מהאקסלים
+SNAPSHOT_PATH = os.environ.get('CONTENT_SNAPSHOT_PATH', 'content_snapshot.db')
+
+# עולה בכל שינוי במבנה ה-snapshot (2: נוסף אינדקס החיפוש), כדי ש-snapshot ישן ייבנה מחדש
+SNAPSHOT_SCHEMA = '2'
+
 def find_file_smart(possible_names):
     for name in possible_names:
         if os.path.exists(name):
             return name
     return None
 
-def load_astro_content():
+def source_fingerprint():
+    """hash של תוכן קבצי האקסל - משתנה בכל עדכון של אחד מהם"""
+    digest = hashlib.sha1()
+    for names in (MAIN_EXCEL_NAMES, SENTENCE_EXCEL_NAMES, INSIDE_EXCEL_NAMES):
+        path = find_file_smart(names)
+        digest.update(f"{path}|".encode())
+        if path:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def source_updated_at():
+    """זמן העדכון האחרון של קבצי המקור (ל-Last-Modified)"""
+    mtimes = [os.path.getmtime(path) for path in
+              (find_file_smart(names) for names in (MAIN_EXCEL_NAMES, SENTENCE_EXCEL_NAMES, INSIDE_EXCEL_NAMES))
+              if path]
+    return datetime.datetime.fromtimestamp(max(mtimes, default=0), datetime.timezone.utc)
+
+def load_content_from_excel():
+    # pandas נטען רק כשבאמת צריך לפרסר את האקסלים
+    import pandas as pd
+
     content = {
         'signs': {}, 'houses': {}, 'degrees': {} 
     }
 
     # 1. טעינת הקובץ המקורי
-    excel_path = 'planets in signs.xlsx'
-    if os.path.exists(excel_path):
+    excel_path = find_file_smart(MAIN_EXCEL_NAMES)
+    if excel_path:
         try:
             df_signs = pd.read_excel(excel_path, sheet_name=0, index_col=0)
             for col_name in df_signs.columns:
@@ -59,10 +95,7 @@ def load_astro_content():
     # =================================================================
     
     # א. משפטים קצרים
-    possible_names_sentences = [
-        'degree sentances.xlsx', 'degree sentences.xlsx', 'Degree Sentences.xlsx'
-    ]
-    found_sent = find_file_smart(possible_names_sentences)
+    found_sent = find_file_smart(SENTENCE_EXCEL_NAMES)
     
     if found_sent:
         try:
@@ -93,10 +126,7 @@ def load_astro_content():
         print(f"⚠️ Warning: Could not find degree sentences file.")
 
     # ב. תיאור ארוך
-    possible_names_inside = [
-        'inside_degrees_final.xlsx', 'Inside_Degrees_Final.xlsx', 'inside degrees final.xlsx'
-    ]
-    found_inside = find_file_smart(possible_names_inside)
+    found_inside = find_file_smart(INSIDE_EXCEL_NAMES)
 
     if found_inside:
         try:
@@ -131,4 +161,88 @@ def load_astro_content():
 
     return content
 
-ASTRO_CONTENT = load_astro_content()
\ No newline at end of file
+# =================================================================
+# 3. snapshot מקומפל - טעינה מהירה בלי pandas/openpyxl
+# =================================================================
+
+def write_snapshot(content, version, path=SNAPSHOT_PATH):
+    # כותבים לקובץ זמני ומחליפים, כדי ש-worker אחר לא יקרא snapshot חצי כתוב
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript("""
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE signs (planet TEXT, sign TEXT, text TEXT, PRIMARY KEY (planet, sign));
+            CREATE TABLE houses (planet TEXT, house INTEGER, text TEXT, PRIMARY KEY (planet, house));
+            CREATE TABLE degrees (sign TEXT, degree INTEGER, sentence TEXT, header TEXT, body TEXT,
+                                  PRIMARY KEY (sign, degree));
+        """)
+        conn.execute("INSERT INTO meta VALUES ('version', ?)", (version,))
+        conn.execute("INSERT INTO meta VALUES ('schema', ?)", (SNAPSHOT_SCHEMA,))
+        conn.executemany("INSERT INTO signs VALUES (?, ?, ?)",
+                         [(p, s, t) for (p, s), t in content['signs'].items()])
+        conn.executemany("INSERT INTO houses VALUES (?, ?, ?)",
+                         [(p, h, t) for (p, h), t in content['houses'].items()])
+        conn.executemany("INSERT INTO degrees VALUES (?, ?, ?, ?, ?)",
+                         [(s, d, v['sentence'], v['header'], v['body'])
+                          for (s, d), v in content['degrees'].items()])
+        # אינדקס החיפוש נבנה יחד עם התוכן ונשמר באותו קובץ
+        docs = content_documents(content)
+        write_index(conn, docs, *build_index(docs))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+def read_snapshot(version, path=SNAPSHOT_PATH):
+    """מחזיר את התוכן מה-snapshot, או None אם הוא חסר/ישן"""
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        if meta.get('version') != version or meta.get('schema') != SNAPSHOT_SCHEMA:
+            return None
+        return {
+            'signs': {(p, s): t for p, s, t in conn.execute("SELECT planet, sign, text FROM signs")},
+            'houses': {(p, h): t for p, h, t in conn.execute("SELECT planet, house, text FROM houses")},
+            'degrees': {(s, d): {'sentence': se, 'header': hd, 'body': bd}
+                        for s, d, se, hd, bd in conn.execute(
+                            "SELECT sign, degree, sentence, header, body FROM degrees")},
+        }
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+def load_astro_content(version=None):
+    """טוען מה-snapshot; חוזר לאקסל (ובונה snapshot חדש) רק אם הוא חסר או ישן"""
+    if version is None:
+        version = source_fingerprint()
+    content = read_snapshot(version)
+    if content is not None:
+        print(f"✅ Loaded content snapshot {version} from '{SNAPSHOT_PATH}'")
+        return content
+
+    content = load_content_from_excel()
+    try:
+        write_snapshot(content, version)
+        print(f"✅ Wrote content snapshot {version} to '{SNAPSHOT_PATH}'")
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Could not write content snapshot: {e}")
+    return content
+
+# גרסת התוכן - משמשת גם לזיהוי snapshot ישן וגם כמפתח למטמונים
+CONTENT_VERSION = source_fingerprint()
+CONTENT_UPDATED_AT = source_updated_at()
+ASTRO_CONTENT = load_astro_content(CONTENT_VERSION)
+
+if __name__ == '__main__':
+    # בנייה מחדש של ה-snapshot: python data_loader.py
+    write_snapshot(load_content_from_excel(), source_fingerprint())
+    print(f"✅ Rebuilt content snapshot '{SNAPSHOT_PATH}'")
\ No newline at end of file
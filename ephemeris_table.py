@@ -0,0 +1,157 @@
+"""
+Precomputed daily body longitudes for fast approximate positions.
+
+    flask --app app build-ephemeris-table --start 1900 --end 2100
+    flask --app app validate-ephemeris-table
+
+The table is a .npy file of shape (days, bodies, 2) holding longitude and daily speed
+at 0h UT for every body in batch_engine.BODIES, opened memory-mapped (pages are
+read on demand and shared between worker processes). A small JSON file next to it
+records the range. Positions between samples come from cubic Hermite interpolation
+on longitude and speed. Plain linear interpolation would be fine for the slow bodies,
+but the Moon covers 12-15 degrees a day at a varying rate and would drift by ~0.1
+degree mid-day. Dates outside the table fall back to swe.calc_ut.
+"""
+import json
+import os
+import time
+
+import numpy as np
+import swisseph as swe
+
+from batch_engine import BODIES
+
+BODY_NAMES = [name for name, _ in BODIES]
+STEP_DAYS = 1.0
+
+
+def meta_path(path):
+    return path + '.json'
+
+
+def build(path, start_year, end_year):
+    """Samples every body daily from Jan 1 start_year to Jan 1 end_year + 1 and writes the table."""
+    start = time.perf_counter()
+    jd_start = swe.julday(start_year, 1, 1, 0.0)
+    jd_end = swe.julday(end_year + 1, 1, 1, 0.0)
+    jds = np.arange(jd_start, jd_end + STEP_DAYS, STEP_DAYS)
+
+    table = np.empty((len(jds), len(BODIES), 2))
+    for j, (_, body_id) in enumerate(BODIES):
+        for i, jd in enumerate(jds):
+            pos = swe.calc_ut(jd, body_id)[0]
+            table[i, j, 0] = pos[0]
+            table[i, j, 1] = pos[3]
+
+    # Both files are written under temporary names and swapped in only once complete,
+    # so a running server never reads half of either
+    tmp_meta = meta_path(path) + '.tmp'
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump({'start_jd': float(jd_start), 'step_days': STEP_DAYS, 'days': len(jds),
+                   'start_year': start_year, 'end_year': end_year, 'bodies': BODY_NAMES,
+                   'swe_version': swe.version}, f, indent=2)
+    tmp_path = path + '.tmp.npy'
+    np.save(tmp_path, table)
+    os.replace(tmp_meta, meta_path(path))
+    os.replace(tmp_path, path)
+    return {'days': len(jds), 'bytes': table.nbytes, 'seconds': round(time.perf_counter() - start, 2)}
+
+
+class EphemerisTable:
+    def __init__(self, path):
+        with open(meta_path(path), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta['bodies'] != BODY_NAMES:
+            raise ValueError(f"Ephemeris table '{path}' was built for other bodies, rebuild it")
+        self.path = path
+        self.start_jd = self.meta['start_jd']
+        self.step = self.meta['step_days']
+        self.data = np.load(path, mmap_mode='r')
+        self.end_jd = self.start_jd + (len(self.data) - 1) * self.step
+
+    def covers(self, jds):
+        jds = np.asarray(jds, dtype=float)
+        return (jds >= self.start_jd) & (jds < self.end_jd)
+
+    def _interpolate(self, jds, bodies, linear=False):
+        """(N,) jds inside the table -> (N, len(bodies)) longitudes."""
+        t = (jds - self.start_jd) / self.step
+        i = np.floor(t).astype(np.int64)
+        f = (t - i)[:, None]
+        lo = self.data[i][:, bodies]
+        hi = self.data[i + 1][:, bodies]
+        p0, v0 = lo[..., 0], lo[..., 1] * self.step
+        p1, v1 = hi[..., 0], hi[..., 1] * self.step
+        # Unwrap across 360 -> 0 (no body moves half a circle in a day)
+        delta = (p1 - p0 + 180.0) % 360.0 - 180.0
+        if linear:
+            return (p0 + f * delta) % 360.0
+        f2, f3 = f * f, f * f * f
+        lon = ((2 * f3 - 3 * f2 + 1) * p0 + (f3 - 2 * f2 + f) * v0
+               + (-2 * f3 + 3 * f2) * (p0 + delta) + (f3 - f2) * v1)
+        return lon % 360.0
+
+    def longitudes(self, jds, bodies=None, linear=False):
+        """
+        (N,) Julian days (UT) -> (N, B) longitudes for `bodies` (names, default all).
+        Dates outside the table are computed with swe.calc_ut instead.
+        """
+        jds = np.atleast_1d(np.asarray(jds, dtype=float))
+        names = bodies or BODY_NAMES
+        cols = [BODY_NAMES.index(b) for b in names]
+        out = np.empty((len(jds), len(cols)))
+
+        inside = self.covers(jds)
+        if inside.any():
+            out[inside] = self._interpolate(jds[inside], cols, linear)
+        for k in np.flatnonzero(~inside):
+            for c, col in enumerate(cols):
+                out[k, c] = swe.calc_ut(jds[k], BODIES[col][1])[0][0]
+        return out
+
+    def validate(self, samples=20000, seed=0):
+        """
+        Max / mean error in degrees against swe.calc_ut at random moments in the table range,
+        per body, for the Hermite lookups (and plain linear interpolation for comparison),
+        plus how often the integer degree differs.
+        """
+        rng = np.random.default_rng(seed)
+        jds = rng.uniform(self.start_jd, self.end_jd, samples)
+        fast = self._interpolate(jds, list(range(len(BODIES))))
+        linear = self._interpolate(jds, list(range(len(BODIES))), linear=True)
+        report = {}
+        for j, (name, body_id) in enumerate(BODIES):
+            exact = np.fromiter((swe.calc_ut(jd, body_id)[0][0] for jd in jds), dtype=float, count=samples)
+            err = np.abs((fast[:, j] - exact + 180.0) % 360.0 - 180.0)
+            lin_err = np.abs((linear[:, j] - exact + 180.0) % 360.0 - 180.0)
+            report[name] = {
+                'max_error_deg': float(err.max()),
+                'mean_error_deg': float(err.mean()),
+                'linear_max_error_deg': float(lin_err.max()),
+                'degree_mismatch_rate': float(np.mean(np.floor(fast[:, j]) != np.floor(exact))),
+            }
+        return report
+
+
+# The table used by the fast-position paths, if one has been activated
+_active = None
+
+
+def activate(path):
+    """
+    Opens the table at `path` for fast lookups. Returns None (and stays on swe) if it
+    is missing or unusable - a stale or damaged table must not keep the app from starting.
+    """
+    global _active
+    _active = None
+    if not path or not os.path.exists(path) or not os.path.exists(meta_path(path)):
+        return None
+    try:
+        _active = EphemerisTable(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Ignoring ephemeris table '{path}': {e}")
+    return _active
+
+
+def active():
+    return _active
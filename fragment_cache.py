@@ -0,0 +1,98 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """
+    In-process LRU cache of rendered HTML, bounded by total size in bytes rather
+    than entry count (a profile page is ~100 KB, a preview about the same).
+    Keys are tuples; entries can be tagged with an owner (user id) so editing
+    or deleting a user drops every page rendered for them.
+    """
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()   # key -> (html bytes, owner)
+        self._owners = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render, owner=None):
+        """Returns the cached page as UTF-8 bytes, calling render() only on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        html = render().encode('utf-8')
+        if len(html) <= self.max_bytes:
+            with self._lock:
+                self._put(key, html, owner)
+        return html
+
+    def invalidate_owner(self, owner):
+        with self._lock:
+            for key in self._owners.pop(owner, ()):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    # --- internals (caller holds the lock) ---
+
+    def _put(self, key, html, owner):
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (html, owner)
+        self._bytes += len(html)
+        if owner is not None:
+            self._owners.setdefault(owner, set()).add(key)
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        html, owner = self._entries.pop(key)
+        self._bytes -= len(html)
+        if owner is not None:
+            keys = self._owners.get(owner)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._owners[owner]
+
+
+def template_version(template_folder):
+    """Short hash over every template's source, so a deploy with changed templates misses the cache."""
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(template_folder)):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, template_folder).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
@@ -0,0 +1,144 @@
+import bisect
+import csv
+import os
+import unicodedata
+
+import numpy as np
+
+# GeoNames dump columns (cities500.txt / cities15000.txt, tab separated, no header)
+GEONAMES_NAME, GEONAMES_ASCII, GEONAMES_LAT, GEONAMES_LON = 1, 2, 4, 5
+GEONAMES_COUNTRY, GEONAMES_ADMIN1, GEONAMES_POPULATION = 8, 10, 14
+
+
+def fold(text):
+    """'São Paulo' -> 'sao paulo': case- and accent-insensitive key."""
+    decomposed = unicodedata.normalize('NFKD', str(text or '').casefold())
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).split())
+
+
+class Gazetteer:
+    """
+    City autocomplete from a local gazetteer, without any network call.
+    Every name (and its ASCII spelling) is folded into one sorted list of keys, so a
+    prefix is two bisects; the matching range is then ranked by population with an
+    argpartition over a parallel NumPy array.
+    """
+    def __init__(self, places):
+        # places: [(name, country, region, lat, lon, population[, ascii_name])]
+        self.names = [p[0] for p in places]
+        self.countries = [p[1] for p in places]
+        self.regions = [p[2] for p in places]
+        self.coords = np.array([(p[3], p[4]) for p in places], dtype=np.float64).reshape(-1, 2)
+
+        keys = []
+        for i, place in enumerate(places):
+            spellings = {fold(place[0])}
+            if len(place) > 6 and place[6]:
+                spellings.add(fold(place[6]))
+            keys.extend((spelling, i) for spelling in spellings)
+        keys.sort()
+        self._keys = [k for k, _ in keys]
+        self._place_of_key = np.array([i for _, i in keys], dtype=np.int32)
+        populations = np.array([p[5] for p in places], dtype=np.int64)
+        self._key_population = populations[self._place_of_key] if len(keys) else populations
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path):
+        """GeoNames .txt dump, or a CSV with name, country, region, latitude, longitude, population."""
+        if path.endswith('.txt'):
+            return cls(_read_geonames(path, *_geonames_labels(path)))
+        return cls(_read_csv(path))
+
+    def search(self, query, limit=8):
+        """
+        Places whose name starts with `query`, most populous first, each place once.
+        'paris, fr' narrows the matches to countries starting with 'fr'.
+        """
+        name_part, _, country_part = str(query or '').partition(',')
+        prefix, country_prefix = fold(name_part), fold(country_part)
+        if not prefix:
+            return []
+
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + '\uffff', lo)
+        if lo == hi:
+            return []
+
+        # Without a country filter only the top few can make it (a place has at most two
+        # keys), so partial sort those; with one, rank the whole range
+        populations = self._key_population[lo:hi]
+        wanted = hi - lo if country_prefix else min(hi - lo, limit * 2)
+        top = np.argpartition(-populations, wanted - 1)[:wanted] if wanted < hi - lo else np.arange(hi - lo)
+        top = top[np.argsort(-populations[top], kind='stable')]
+
+        results, seen = [], set()
+        for k in top:
+            i = int(self._place_of_key[lo + k])
+            if i in seen or (country_prefix and not fold(self.countries[i]).startswith(country_prefix)):
+                continue
+            seen.add(i)
+            results.append(self._place(i, int(populations[k])))
+            if len(results) >= limit:
+                break
+        return results
+
+    def _place(self, i, population):
+        name, country, region = self.names[i], self.countries[i], self.regions[i]
+        return {
+            'name': name, 'country': country, 'region': region,
+            'label': f"{name}, {country}" if country else name,
+            'latitude': round(float(self.coords[i, 0]), 5),
+            'longitude': round(float(self.coords[i, 1]), 5),
+            'population': population,
+        }
+
+
+def _lookup_file(path, key_col, value_col):
+    names = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                cols = line.rstrip('\n').split('\t')
+                if not line.startswith('#') and len(cols) > max(key_col, value_col):
+                    names[cols[key_col]] = cols[value_col]
+    return names
+
+
+def _geonames_labels(path):
+    """
+    Country and region names from GeoNames' countryInfo.txt and admin1CodesASCII.txt
+    next to the dump; without them the raw codes are shown.
+    """
+    folder = os.path.dirname(path)
+    return (_lookup_file(os.path.join(folder, 'countryInfo.txt'), 0, 4),
+            _lookup_file(os.path.join(folder, 'admin1CodesASCII.txt'), 0, 1))
+
+
+def _read_geonames(path, countries, regions):
+    places = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            cols = line.rstrip('\n').split('\t')
+            if len(cols) <= GEONAMES_POPULATION:
+                continue
+            code, admin1 = cols[GEONAMES_COUNTRY], cols[GEONAMES_ADMIN1]
+            places.append((cols[GEONAMES_NAME], countries.get(code, code), regions.get(f"{code}.{admin1}", ''),
+                           float(cols[GEONAMES_LAT]), float(cols[GEONAMES_LON]),
+                           int(cols[GEONAMES_POPULATION] or 0), cols[GEONAMES_ASCII]))
+    return places
+
+
+def _read_csv(path):
+    places = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            try:
+                places.append((row['name'], row.get('country') or '', row.get('region') or '',
+                               float(row['latitude']), float(row['longitude']),
+                               int(float(row.get('population') or 0))))
+            except (KeyError, ValueError):
+                continue
+    return places
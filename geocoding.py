@@ -0,0 +1,143 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+# Same attribute names as geopy's Location, so upstreams are interchangeable
+Location = namedtuple('Location', ['latitude', 'longitude'])
+
+
+def normalize_city(city_name):
+    """'  Tel-Aviv ,ISRAEL ' -> 'tel-aviv, israel'"""
+    text = unicodedata.normalize('NFKC', str(city_name or '')).casefold()
+    text = re.sub(r'\s*,\s*', ', ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip(' ,')
+
+
+class StaticGeocoder:
+    """
+    Local stand-in for Nominatim (tests / offline mode).
+    Answers from a {city: (lat, lon)} mapping and never touches the network.
+    """
+    def __init__(self, places=None):
+        self.places = {normalize_city(k): tuple(v) for k, v in (places or {}).items()}
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def geocode(self, query, timeout=None):
+        coords = self.places.get(normalize_city(query))
+        return Location(*coords) if coords else None
+
+
+class CachedGeocoder:
+    """
+    Geocoding layer in front of an upstream (Nominatim or StaticGeocoder):
+    - results are stored in a SQLite table keyed by the normalized city string
+    - concurrent lookups of the same city share a single upstream call
+    - upstream calls are spaced at least min_interval seconds apart
+      (Nominatim's usage policy allows one request per second)
+    """
+    def __init__(self, upstream, db_path, min_interval=1.0):
+        self.upstream = upstream
+        self.min_interval = min_interval
+        self.hits = 0
+        self.misses = 0
+        self.db_path = db_path
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.reopen()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._rate_lock = threading.Lock()
+        self._last_call = 0.0
+
+    def reopen(self):
+        """(Re)connects to the cache file - called again in each worker after a fork."""
+        with self._db_lock:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS geocode_cache ("
+                " query TEXT PRIMARY KEY, latitude REAL NOT NULL, longitude REAL NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def lookup(self, city_name):
+        """Returns (lat, lon), or (None, None) if the city can't be resolved."""
+        key = normalize_city(city_name)
+        if not key:
+            return None, None
+
+        cached = self._read(key)
+        if cached:
+            self.hits += 1
+            return cached
+
+        # Coalesce: the first caller fetches, everyone else waits for its answer
+        with self._inflight_lock:
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = {'event': threading.Event(), 'result': (None, None)}
+
+        if not leader:
+            pending['event'].wait()
+            return pending['result']
+
+        try:
+            self.misses += 1
+            result = self._fetch(city_name)
+            if result[0] is not None:
+                self._write(key, result)
+            pending['result'] = result
+            return result
+        finally:
+            pending['event'].set()
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._db_lock:
+            size = self._db.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+        return {'size': size, 'hits': self.hits, 'misses': self.misses}
+
+    def _read(self, key):
+        with self._db_lock:
+            row = self._db.execute("SELECT latitude, longitude FROM geocode_cache WHERE query = ?",
+                                   (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def _write(self, key, coords):
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO geocode_cache (query, latitude, longitude, created_at)"
+                             " VALUES (?, ?, ?, ?)", (key, coords[0], coords[1], time.time()))
+            self._db.commit()
+
+    def _throttle(self):
+        with self._rate_lock:
+            wait = self._last_call + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_call = time.monotonic()
+
+    def _fetch(self, city_name):
+        # One retry with a longer timeout, as the app did before this layer existed
+        for timeout in (10, 15):
+            self._throttle()
+            try:
+                location = self.upstream.geocode(city_name, timeout=timeout)
+                if location:
+                    return location.latitude, location.longitude
+                return None, None
+            except (GeocoderTimedOut, GeocoderServiceError):
+                print(f"⚠️ Timeout for {city_name}, trying again...")
+        return None, None
@@ -0,0 +1,26 @@
+"""
+gunicorn settings for wsgi:app.
+
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is loaded once in the master (preload_app) and then forked, so the
+content, asset manifest, timezone polygons and search index are shared
+copy-on-write instead of being rebuilt per worker.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# The app sizes its per-worker chart pool from this (CHARTS_API_WORKERS)
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+preload_app = True
+# Bulk imports stream for as long as they run
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    from app import reset_after_fork
+    reset_after_fork()
@@ -0,0 +1,104 @@
+"""
+Offline generator for resized WebP/AVIF copies of the degree images and zodiac icons.
+
+    python image_variants.py            # only (re)builds what changed
+    python image_variants.py --force
+
+Writes the files under static/derived/ plus static/derived/variants.json,
+which AssetManifest reads at startup to build srcset URLs.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from assets import AssetManifest, file_digest, VARIANTS_INDEX
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DERIVED_DIR = os.path.dirname(VARIANTS_INDEX)
+
+# Degree images show as an 80px icon on the profile and up to 450px in the modal (x2 for retina)
+DEGREE_WIDTHS = (160, 480, 960)
+ICON_WIDTHS = (64, 128)
+
+QUALITY = {'webp': 80, 'avif': 60}
+
+
+def available_formats():
+    from PIL import features
+    formats = ['webp'] if features.check('webp') else []
+    if features.check('avif'):
+        formats.insert(0, 'avif')
+    return formats
+
+
+def load_index(static_folder):
+    path = os.path.join(static_folder, VARIANTS_INDEX)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_variants(static_folder=STATIC_FOLDER, force=False):
+    try:
+        from PIL import Image
+    except ImportError:
+        sys.exit("❌ Pillow is required to build image variants: pip install Pillow")
+
+    formats = available_formats()
+    manifest = AssetManifest(static_folder)
+    old_index = {} if force else load_index(static_folder)
+    index = {}
+    written = 0
+    start = time.perf_counter()
+
+    sources = [(p, DEGREE_WIDTHS) for p in manifest.degree_images.values()]
+    sources += [(p, ICON_WIDTHS) for p in manifest.sign_icons.values()]
+
+    for rel_path, widths in sources:
+        digest = manifest.digests[rel_path]
+        previous = old_index.get(rel_path)
+        if previous and previous['source_digest'] == digest and all(
+                os.path.exists(os.path.join(static_folder, v['path'])) for v in previous['variants']):
+            index[rel_path] = previous
+            continue
+
+        variants = []
+        base, _ = os.path.splitext(rel_path)
+        with Image.open(os.path.join(static_folder, rel_path)) as img:
+            img.load()
+            for width in widths:
+                if width >= img.width and width != widths[0]:
+                    continue  # never upscale beyond the smallest variant
+                height = round(img.height * width / img.width)
+                resized = img.resize((width, height), Image.LANCZOS)
+                if resized.mode not in ('RGB', 'RGBA'):
+                    resized = resized.convert('RGBA' if 'A' in resized.getbands() else 'RGB')
+                for fmt in formats:
+                    out_rel = f"{DERIVED_DIR}/{base}-{width}.{fmt}"
+                    out_path = os.path.join(static_folder, out_rel)
+                    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                    resized.save(out_path, fmt.upper(), quality=QUALITY[fmt])
+                    variants.append({'path': out_rel, 'width': width, 'format': fmt,
+                                     'digest': file_digest(out_path)})
+                    written += 1
+
+        index[rel_path] = {'source_digest': digest, 'variants': variants}
+
+    index_path = os.path.join(static_folder, VARIANTS_INDEX)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+
+    print(f"✅ {len(index)} images, {written} variants written in "
+          f"{time.perf_counter() - start:.1f}s (formats: {', '.join(formats)})")
+    return index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--force', action='store_true', help='rebuild every variant')
+    args = parser.parse_args()
+    build_variants(force=args.force)
@@ -0,0 +1,164 @@
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+
+from flask import g, has_request_context, request, template_rendered, before_render_template
+
+# Request latency buckets in seconds (Prometheus 'le' bounds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_DISABLED_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_phase(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def record_phase(name, seconds):
+    """Adds time to a phase of the current request (no-op outside a request)."""
+    if not has_request_context():
+        return
+    phases = g.get('_phases')
+    if phases is None:
+        return
+    phases[name] = phases.get(name, 0.0) + seconds
+
+
+class Metrics:
+    """
+    Phase timing per request (geocode, ephemeris, db, assets, render ...), sent back as a
+    Server-Timing header and aggregated into Prometheus histograms per route.
+    While disabled, span() hands out one shared no-op context manager and no request
+    hooks, signal receivers or SQLAlchemy listeners are installed.
+    """
+    def __init__(self, enabled=False, buckets=LATENCY_BUCKETS, prefix='inside_time'):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._requests = {}   # (route, method) -> {'counts': [...], 'sum': float, 'count': int}
+        self._statuses = {}   # (route, method, status) -> count
+        self._phases = {}     # (route, phase) -> [sum, count]
+
+    def span(self, name):
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return _Span(name)
+
+    def init_app(self, app, engine=None):
+        if not self.enabled:
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._render_started, app, weak=False)
+        template_rendered.connect(self._render_finished, app, weak=False)
+        if engine is not None:
+            self.instrument_engine(engine)
+
+    def instrument_engine(self, engine):
+        from sqlalchemy import event
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            record_phase('db', time.perf_counter() - conn.info['_query_start'].pop())
+
+    # --- request hooks ---
+
+    def _start_request(self):
+        g._phases = {}
+        g._request_start = time.perf_counter()
+
+    def _render_started(self, sender, template, context, **extra):
+        if has_request_context():
+            g._render_start = time.perf_counter()
+
+    def _render_finished(self, sender, template, context, **extra):
+        if has_request_context() and g.get('_render_start') is not None:
+            record_phase('render', time.perf_counter() - g.pop('_render_start'))
+
+    def _finish_request(self, response):
+        start = g.get('_request_start')
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        phases = g.get('_phases', {})
+
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        response.headers['Server-Timing'] = ', '.join(entries)
+
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        self.observe(route, request.method, response.status_code, total, phases)
+        return response
+
+    # --- aggregation ---
+
+    def observe(self, route, method, status, seconds, phases=None):
+        with self._lock:
+            hist = self._requests.get((route, method))
+            if hist is None:
+                hist = self._requests[(route, method)] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            idx = bisect.bisect_left(self.buckets, seconds)
+            if idx < len(self.buckets):
+                hist['counts'][idx] += 1
+            hist['sum'] += seconds
+            hist['count'] += 1
+
+            key = (route, method, str(status))
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+            for phase, phase_seconds in (phases or {}).items():
+                acc = self._phases.setdefault((route, phase), [0.0, 0])
+                acc[0] += phase_seconds
+                acc[1] += 1
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_request_duration_seconds Request latency by route.",
+            f"# TYPE {p}_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (route, method), hist in sorted(self._requests.items()):
+                labels = f'route="{_escape(route)}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, hist['counts']):
+                    cumulative += count
+                    lines.append(f'{p}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{p}_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist["count"]}')
+                lines.append(f'{p}_request_duration_seconds_sum{{{labels}}} {hist["sum"]:.6f}')
+                lines.append(f'{p}_request_duration_seconds_count{{{labels}}} {hist["count"]}')
+
+            lines += [f"# HELP {p}_requests_total Requests by route and status.",
+                      f"# TYPE {p}_requests_total counter"]
+            for (route, method, status), count in sorted(self._statuses.items()):
+                lines.append(f'{p}_requests_total{{route="{_escape(route)}",method="{method}",status="{status}"}} {count}')
+
+            lines += [f"# HELP {p}_phase_seconds Time spent per phase of a request.",
+                      f"# TYPE {p}_phase_seconds summary"]
+            for (route, phase), (total, count) in sorted(self._phases.items()):
+                labels = f'route="{_escape(route)}",phase="{phase}"'
+                lines.append(f'{p}_phase_seconds_sum{{{labels}}} {total:.6f}')
+                lines.append(f'{p}_phase_seconds_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
@@ -0,0 +1,76 @@
+from collections import Counter
+
+import numpy as np
+
+from batch_engine import BODIES
+from data_loader import ZODIAC_SIGNS
+
+# Bodies counted in the population heatmap (the Ascendant is always in house 1, so it is left out)
+STAT_BODIES = [name for name, _ in BODIES]
+
+# Slots per kind: 12 signs x 30 degrees, and 12 houses
+SLOTS = {'degree': 360, 'house': 12}
+
+
+def degree_slot(sign, degree):
+    """('Taurus', 1) -> 30: zero-based index of a sign-degree (degrees run 1-30)."""
+    return ZODIAC_SIGNS.index(sign) * 30 + min(max(int(degree), 1), 30) - 1
+
+
+def slot_degree(slot):
+    """Inverse of degree_slot: 30 -> ('Taurus', 1)."""
+    slot = int(slot)
+    return ZODIAC_SIGNS[slot // 30], slot % 30 + 1
+
+
+def slot_counts(rows):
+    """
+    Counter {(body, kind, slot): n} over placement rows (dicts with body, sign, degree
+    and house), skipping points that are not in STAT_BODIES.
+    """
+    counts = Counter()
+    bodies = set(STAT_BODIES)
+    for row in rows:
+        if row['body'] not in bodies:
+            continue
+        counts[(row['body'], 'degree', degree_slot(row['sign'], row['degree']))] += 1
+        counts[(row['body'], 'house', int(row['house']) - 1)] += 1
+    return counts
+
+
+def empty_arrays():
+    """{'degree': (bodies, 360), 'house': (bodies, 12)} zero int arrays."""
+    return {kind: np.zeros((len(STAT_BODIES), n), dtype=np.int64) for kind, n in SLOTS.items()}
+
+
+def to_arrays(cells):
+    """(body, kind, slot, count) tuples -> the arrays of empty_arrays()."""
+    arrays = empty_arrays()
+    index = {body: i for i, body in enumerate(STAT_BODIES)}
+    for body, kind, slot, count in cells:
+        if body in index and kind in arrays:
+            arrays[kind][index[body], slot] = count
+    return arrays
+
+
+def summarize(arrays, body=None, top=20):
+    """
+    Heatmap of one body (or all bodies summed when body is None): per-degree and
+    per-house counts, the `top` most populated degrees and the degrees nobody has.
+    """
+    if body is None:
+        degrees, houses = arrays['degree'].sum(axis=0), arrays['house'].sum(axis=0)
+    else:
+        i = STAT_BODIES.index(body)
+        degrees, houses = arrays['degree'][i], arrays['house'][i]
+
+    order = np.argsort(-degrees, kind='stable')[:top]
+    return {
+        'body': body,
+        'total': int(degrees.sum()),
+        'degrees': degrees.tolist(),
+        'houses': houses.tolist(),
+        'top': [dict(zip(('sign', 'degree'), slot_degree(s)), count=int(degrees[s]))
+                for s in order if degrees[s] > 0],
+        'empty': [dict(zip(('sign', 'degree'), slot_degree(s))) for s in np.flatnonzero(degrees == 0)],
+    }
@@ -0,0 +1,260 @@
+import html
+import json
+import math
+import re
+import sqlite3
+import threading
+
+# Field weights: a hit in a degree's one-line sentence counts more than one in its long body
+FIELD_WEIGHTS = {'title': 2.0, 'sentence': 3.0, 'header': 2.0, 'body': 1.0, 'text': 1.0}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+SNIPPET_WORDS = 30
+
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just me
+more most my myself no nor not now of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then there these they
+this those through to too under until up very was we were what when where which while who whom
+why will with you your yours yourself yourselves
+""".split())
+
+# Longest suffix first; (suffix, replacement, minimum stem length left behind)
+_SUFFIXES = (
+    ('ational', 'ate', 3), ('fulness', 'ful', 3), ('iveness', 'ive', 3), ('ization', 'ize', 3),
+    ('ousness', 'ous', 3), ('ements', '', 4), ('ement', '', 4), ('ments', '', 4), ('ment', '', 4),
+    ('ness', '', 3), ('ities', '', 3), ('ity', '', 3), ('ingly', '', 3), ('edly', '', 3),
+    ('ing', '', 3), ('ies', 'y', 2), ('ied', 'y', 2), ('ly', '', 4), ('ed', '', 3),
+    ('es', '', 4), ('s', '', 3),
+)
+
+
+def stem(word):
+    """
+    Light suffix-stripping stemmer (plural, -ed/-ing, -ly, -ness, -ment ...), enough
+    to put 'dreams'/'dreaming'/'dreamed' and 'love'/'loved' on one stem without a
+    stemming library.
+    """
+    if word.endswith("'s"):
+        word = word[:-2]
+    if len(word) > 3:
+        for suffix, replacement, min_stem in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+                if suffix == 's' and word.endswith('ss'):
+                    break
+                word = word[:-len(suffix)] + replacement
+                # 'running' -> 'runn' -> 'run'
+                if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+                    word = word[:-1]
+                break
+    # 'love'/'lov(ed)', 'happy'/'happi(ness)' meet on the same stem
+    if len(word) > 3 and word.endswith('e'):
+        word = word[:-1]
+    elif len(word) > 3 and word.endswith('y'):
+        word = word[:-1] + 'i'
+    return word
+
+
+def tokens(text):
+    """Stemmed search terms of a text, stopwords removed."""
+    return [stem(w) for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+def content_documents(content):
+    """
+    Every searchable entry of ASTRO_CONTENT as (kind, key1, key2, {field: text}):
+    degrees are ('degree', sign, degree), planet-in-sign ('sign', planet, sign)
+    and planet-in-house ('house', planet, house). The title field makes planet and
+    sign names searchable ('venus love').
+    """
+    docs = []
+    for (sign, degree), entry in sorted(content['degrees'].items()):
+        fields = {f: entry.get(f) or '' for f in ('sentence', 'header', 'body')}
+        docs.append(('degree', sign, str(degree), dict(fields, title=sign)))
+    for (planet, sign), text in sorted(content['signs'].items()):
+        docs.append(('sign', planet, sign, {'title': f"{planet} {sign}", 'text': text}))
+    for (planet, house), text in sorted(content['houses'].items()):
+        docs.append(('house', planet, str(house), {'title': f"{planet} house", 'text': text}))
+    return docs
+
+
+def build_index(docs):
+    """Inverted index: ({term: [[doc_id, weighted_tf], ...]}, [doc_length, ...])."""
+    postings, lengths = {}, []
+    for doc_id, (_, _, _, fields) in enumerate(docs):
+        tf = {}
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokens(text):
+                tf[term] = tf.get(term, 0.0) + weight
+        for term, freq in tf.items():
+            postings.setdefault(term, []).append([doc_id, freq])
+        lengths.append(sum(tf.values()))
+    return postings, lengths
+
+
+def write_index(conn, docs, postings, lengths):
+    """Stores the index in the content snapshot (same SQLite file, same version)."""
+    conn.executescript("""
+        CREATE TABLE search_docs (id INTEGER PRIMARY KEY, kind TEXT, key1 TEXT, key2 TEXT, length REAL);
+        CREATE TABLE search_terms (term TEXT PRIMARY KEY, postings TEXT NOT NULL);
+    """)
+    conn.executemany("INSERT INTO search_docs VALUES (?, ?, ?, ?, ?)",
+                     [(i, kind, k1, k2, lengths[i]) for i, (kind, k1, k2, _) in enumerate(docs)])
+    conn.executemany("INSERT INTO search_terms VALUES (?, ?)",
+                     [(term, json.dumps(plist, separators=(',', ':'))) for term, plist in postings.items()])
+
+
+class ContentSearch:
+    """
+    Keyword search over the interpretation texts, ranked with BM25.
+    Postings are read per query term from the snapshot's search_terms table (primary
+    key lookups, nothing is scanned); without a snapshot of the same version the index
+    is built in memory from the content instead. Raw texts for snippets come from `content`.
+    """
+    def __init__(self, content, snapshot_path=None, version=None):
+        self.content = content
+        self.snapshot_path = snapshot_path
+        self.version = version
+        self._docs = None
+        self._lengths = None
+        self._memory_postings = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # --- loading ---
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.snapshot_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def _ensure_loaded(self):
+        if self._docs is not None:
+            return
+        with self._lock:
+            if self._docs is not None:
+                return
+            if self.snapshot_path:
+                try:
+                    conn = self._connection()
+                    stored = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                    if self.version is None or (stored and stored[0] == self.version):
+                        rows = conn.execute("SELECT kind, key1, key2, length FROM search_docs ORDER BY id").fetchall()
+                        self._lengths = [r[3] for r in rows]
+                        self._docs = [(r[0], r[1], r[2]) for r in rows]
+                        return
+                    print("⚠️ Content snapshot has another version, building the search index in memory")
+                except sqlite3.Error as e:
+                    print(f"⚠️ Search index not found in snapshot ({e}), building it in memory")
+            docs = content_documents(self.content)
+            self._memory_postings, self._lengths = build_index(docs)
+            self._docs = [(kind, k1, k2) for kind, k1, k2, _ in docs]
+
+    def preload(self):
+        """
+        Reads the document table now and drops this thread's connection, so a
+        server can warm the index before forking without sharing an SQLite handle.
+        """
+        self._ensure_loaded()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self._local = threading.local()
+
+    def _postings(self, terms):
+        if self._memory_postings is not None:
+            return {t: self._memory_postings[t] for t in terms if t in self._memory_postings}
+        placeholders = ','.join('?' * len(terms))
+        rows = self._connection().execute(
+            f"SELECT term, postings FROM search_terms WHERE term IN ({placeholders})", list(terms)).fetchall()
+        return {term: json.loads(plist) for term, plist in rows}
+
+    # --- querying ---
+
+    def search(self, query, limit=20, kinds=None):
+        """
+        [{'kind', 'key', 'score', 'matched', 'snippet'}, ...] best first. Documents
+        matching more of the query terms always rank above those matching fewer.
+        The snippet is HTML-escaped with the hits wrapped in <mark>.
+        """
+        terms = list(dict.fromkeys(tokens(query)))
+        if not terms:
+            return []
+        self._ensure_loaded()
+        postings = self._postings(terms)
+
+        n_docs = len(self._docs)
+        avg_len = (sum(self._lengths) / n_docs) if n_docs else 1.0
+        scores, matched = {}, {}
+        for term, plist in postings.items():
+            idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc_id, tf in plist:
+                if kinds and self._docs[doc_id][0] not in kinds:
+                    continue
+                norm = tf + K1 * (1 - B + B * self._lengths[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / norm
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+
+        ranked = sorted(scores, key=lambda d: (-matched[d], -scores[d]))[:limit]
+        term_set = set(terms)
+        return [{
+            'kind': self._docs[d][0],
+            'key': self._doc_key(d),
+            'score': round(scores[d], 3),
+            'matched': matched[d],
+            'snippet': self._snippet(d, term_set),
+        } for d in ranked]
+
+    def _doc_key(self, doc_id):
+        kind, key1, key2 = self._docs[doc_id]
+        if kind == 'degree':
+            return {'sign': key1, 'degree': int(key2)}
+        if kind == 'sign':
+            return {'planet': key1, 'sign': key2}
+        return {'planet': key1, 'house': int(key2)}
+
+    def _fields(self, doc_id):
+        kind, key1, key2 = self._docs[doc_id]
+        if kind == 'degree':
+            entry = self.content['degrees'].get((key1, int(key2)), {})
+            return [entry.get(f) or '' for f in ('sentence', 'header', 'body')]
+        if kind == 'sign':
+            return [self.content['signs'].get((key1, key2), '')]
+        return [self.content['houses'].get((key1, int(key2)), '')]
+
+    def _snippet(self, doc_id, terms):
+        """The SNIPPET_WORDS-word window with the most hits, from the best matching field."""
+        best = None
+        for text in self._fields(doc_id):
+            words = text.split()
+            hits = [stem(w.strip('.,;:!?"()[]').lower()) in terms for w in words]
+            if not words:
+                continue
+            window = min(SNIPPET_WORDS, len(words))
+            count = sum(hits[:window])
+            top, top_start = count, 0
+            for start in range(1, len(words) - window + 1):
+                count += hits[start + window - 1] - hits[start - 1]
+                if count > top:
+                    top, top_start = count, start
+            if best is None or top > best[0]:
+                best = (top, words, hits, top_start, window)
+
+        if best is None:
+            return ''
+        _, words, hits, start, window = best
+        parts = [f"<mark>{html.escape(w)}</mark>" if hit else html.escape(w)
+                 for w, hit in zip(words[start:start + window], hits[start:start + window])]
+        prefix = '… ' if start > 0 else ''
+        suffix = ' …' if start + window < len(words) else ''
+        return prefix + ' '.join(parts) + suffix
@@ -0,0 +1,147 @@
+import csv
+import datetime
+import io
+import json
+
+from batch_engine import CHART_POINTS
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+USER_COLUMNS = ['id', 'name', 'city', 'birth_date', 'birth_time', 'latitude', 'longitude',
+                'timezone', 'birth_utc', 'julian_day']
+
+# Flat (CSV / Parquet) layout: four columns per chart point, e.g. sun_sign, sun_degree, sun_longitude, sun_house
+POINT_FIELDS = (('sign', 'sign'), ('degree', 'degree_int'), ('longitude', 'degree_total'), ('house', 'house'))
+
+
+def _column_prefix(point):
+    return point.lower().replace(' ', '_')
+
+
+FLAT_COLUMNS = USER_COLUMNS + [f"{_column_prefix(p)}_{name}" for p in CHART_POINTS for name, _ in POINT_FIELDS]
+
+
+def format_for(filename, default='csv'):
+    """'souls.parquet' -> 'parquet'; unknown extensions fall back to default."""
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return ext if ext in FORMATS else default
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def flat_row(user, chart):
+    """One soul as a FLAT_COLUMNS dict; chart may be None (unparseable birth time)."""
+    row = {col: _plain(user[col]) for col in USER_COLUMNS}
+    points = {p['planet']: p for p in chart or ()}
+    for point in CHART_POINTS:
+        placement = points.get(point)
+        for name, key in POINT_FIELDS:
+            row[f"{_column_prefix(point)}_{name}"] = placement[key] if placement else None
+    return row
+
+
+def nested_row(user, chart):
+    row = {col: _plain(user[col]) for col in USER_COLUMNS}
+    row['placements'] = chart
+    return row
+
+
+def encode(fmt, chunks):
+    """
+    Serializes chunks of (user dict, chart) pairs into `fmt`, yielding bytes as each
+    chunk is done - only one chunk is ever held in memory, whatever the table size.
+    """
+    if fmt == 'csv':
+        return _encode_csv(chunks)
+    if fmt == 'ndjson':
+        return _encode_ndjson(chunks)
+    if fmt == 'parquet':
+        return _encode_parquet(chunks)
+    raise ValueError(f"Unsupported export format '{fmt}' (expected {', '.join(FORMATS)})")
+
+
+def _encode_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FLAT_COLUMNS)
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(flat_row(user, chart) for user, chart in chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _encode_ndjson(chunks):
+    for chunk in chunks:
+        yield ''.join(json.dumps(nested_row(user, chart), ensure_ascii=False) + '\n'
+                      for user, chart in chunk).encode('utf-8')
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only stream that hands back whatever was written since the last drain()."""
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+    types = {'id': pa.int64(), 'latitude': pa.float64(), 'longitude': pa.float64(),
+             'julian_day': pa.float64(), 'birth_utc': pa.string()}
+    fields = [pa.field(col, types.get(col, pa.string())) for col in USER_COLUMNS]
+    point_types = {'sign': pa.string(), 'degree': pa.int32(), 'longitude': pa.float64(), 'house': pa.int32()}
+    for point in CHART_POINTS:
+        fields += [pa.field(f"{_column_prefix(point)}_{name}", point_types[name]) for name, _ in POINT_FIELDS]
+    return pa.schema(fields)
+
+
+def _encode_parquet(chunks):
+    # pyarrow is optional - only needed for this format
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for chunk in chunks:
+            # One row group per chunk
+            rows = [flat_row(user, chart) for user, chart in chunk]
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def check_format(fmt):
+    """Raises ValueError for an unknown format, or one whose optional dependency is missing."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}' (expected {', '.join(FORMATS)})")
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export needs the 'pyarrow' package (pip install pyarrow)")
@@ -0,0 +1,82 @@
+// השלמה אוטומטית של עיר בטפסי הוספה ועריכה של נשמה (add_profile / edit_profile).
+// נטען בסוף הטופס: <script src=".../city_autocomplete.js" data-cities-url="/api/cities">
+(function() {
+    const citiesUrl = document.currentScript.dataset.citiesUrl;
+    const cityInput = document.getElementById('location');
+    const latInput = document.getElementById('latitude');
+    const lonInput = document.getElementById('longitude');
+    const suggestionsList = document.getElementById('suggestions-list');
+    let localCities = true; // יורד ל-false אם לשרת אין קובץ ערים
+
+    // הצעות מהגזטיר המקומי של השרת (בלי רשת חיצונית), ו-Photon רק אם אין גזטיר
+    function fetchCities(query) {
+        if (localCities) {
+            return fetch(`${citiesUrl}?q=${encodeURIComponent(query)}&limit=6`).then(response => {
+                if (response.status === 404) { localCities = false; return fetchCities(query); }
+                return response.json().then(data => data.cities.map(c => ({
+                    name: c.name, detail: [c.region, c.country].filter(Boolean).join(', '),
+                    label: c.label, lat: c.latitude, lon: c.longitude
+                })));
+            });
+        }
+        return fetch(`https://photon.komoot.io/api/?q=${encodeURIComponent(query)}&limit=5&lang=en`)
+            .then(response => response.json())
+            .then(data => (data.features || []).map(feature => {
+                const props = feature.properties;
+                const country = props.country || '';
+                return {
+                    name: props.name, detail: [props.state, country].filter(Boolean).join(', '),
+                    label: country ? `${props.name}, ${country}` : props.name,
+                    lat: feature.geometry.coordinates[1], lon: feature.geometry.coordinates[0]
+                };
+            }));
+    }
+
+    cityInput.addEventListener('input', function() {
+        const query = this.value;
+        // טקסט חדש - הקואורדינטות של הבחירה הקודמת כבר לא תקפות
+        latInput.value = '';
+        lonInput.value = '';
+
+        if (query.length < 2) {
+            suggestionsList.style.display = 'none';
+            return;
+        }
+
+        fetchCities(query)
+            .then(cities => {
+                if (query !== cityInput.value) return; // הגיעה תשובה לשאילתה ישנה
+                suggestionsList.innerHTML = '';
+                if (!cities.length) {
+                    suggestionsList.style.display = 'none';
+                    return;
+                }
+                suggestionsList.style.display = 'block';
+                cities.forEach(city => {
+                    const li = document.createElement('li');
+                    li.textContent = city.name + ' ';
+                    const detail = document.createElement('span');
+                    detail.className = 'country-name';
+                    detail.textContent = city.detail;
+                    li.appendChild(detail);
+
+                    // בחירה ממלאת גם את הקואורדינטות - השרת לא צריך לחפש את העיר
+                    li.addEventListener('click', function() {
+                        cityInput.value = city.label;
+                        latInput.value = city.lat;
+                        lonInput.value = city.lon;
+                        suggestionsList.style.display = 'none';
+                    });
+                    suggestionsList.appendChild(li);
+                });
+            })
+            .catch(err => console.error('Error fetching cities:', err));
+    });
+
+    // סגירת הרשימה אם לוחצים מחוץ לה
+    document.addEventListener('click', function(e) {
+        if (e.target !== cityInput && e.target !== suggestionsList) {
+            suggestionsList.style.display = 'none';
+        }
+    });
+})();
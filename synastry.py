@@ -0,0 +1,172 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_engine import CHART_POINTS
+
+# (name, exact angle, orb, weight) - harmonious aspects add to the score, hard ones subtract
+ASPECTS = (
+    ('Conjunction', 0.0, 8.0, 1.0),
+    ('Sextile', 60.0, 4.0, 0.5),
+    ('Square', 90.0, 6.0, -0.75),
+    ('Trine', 120.0, 6.0, 1.0),
+    ('Opposition', 180.0, 8.0, -0.5),
+)
+
+# Longitudes are binned every 0.1 degree around the circle
+TABLE_STEP = 0.1
+N_BINS = int(round(360 / TABLE_STEP))
+
+# Strength of every signed offset between two bins:
+# weight * (1 - |distance - angle| / orb) inside an orb, 0 outside
+_offsets = np.arange(N_BINS) * TABLE_STEP
+_distances = np.minimum(_offsets, 360.0 - _offsets)
+STRENGTH_TABLE = np.zeros(N_BINS, dtype=np.float32)
+for _, _angle, _orb, _weight in ASPECTS:
+    STRENGTH_TABLE += (_weight * np.clip(1 - np.abs(_distances - _angle) / _orb, 0, None)).astype(np.float32)
+
+# Upper bound on scores per tile (rows x columns), ~4 MB of float32
+TILE_ELEMENTS = 1 << 20
+
+
+def angular_distance(a, b):
+    d = np.abs(a - b) % 360.0
+    return np.minimum(d, 360.0 - d)
+
+
+def to_bins(lons):
+    return np.rint(np.asarray(lons) / TABLE_STEP).astype(np.intp) % N_BINS
+
+
+def aspect_profiles(bins):
+    """
+    (n, P) bins -> (n, N_BINS): what a point at each bin would score against the chart,
+    i.e. each chart's point histogram circularly convolved with STRENGTH_TABLE (via FFT).
+    score(i, j) is then the sum of profile_i at chart j's P bins - P lookups per pair
+    instead of P x P angular differences.
+    """
+    n = len(bins)
+    flat = (np.arange(n)[:, None] * N_BINS + bins).ravel()
+    hist = np.bincount(flat, minlength=n * N_BINS).reshape(n, N_BINS)
+    profiles = np.fft.irfft(np.fft.rfft(hist, axis=1) * _STRENGTH_SPECTRUM, n=N_BINS, axis=1)
+    return profiles.astype(np.float32)
+
+
+_STRENGTH_SPECTRUM = np.fft.rfft(STRENGTH_TABLE.astype(np.float64))
+
+
+def _scores_from_profiles(profiles_t, col_bins):
+    """profiles_t is (N_BINS, n) - one contiguous row per bin, so every lookup gathers whole rows."""
+    scores = profiles_t[col_bins[:, 0]].copy()
+    for q in range(1, col_bins.shape[1]):
+        scores += profiles_t[col_bins[:, q]]
+    return scores.T
+
+
+def pair_scores(a, b):
+    """
+    Compatibility of every chart in a (n, P) against every chart in b (m, P) -> (n, m).
+    Each score sums the aspect strengths of all P x P point pairs (positions rounded
+    to 0.1 degree).
+    """
+    return _scores_from_profiles(np.ascontiguousarray(aspect_profiles(to_bins(a)).T), to_bins(b))
+
+
+def aspect_details(lon_a, lon_b, points=CHART_POINTS):
+    """Aspects between two single charts: [{'a', 'b', 'aspect', 'orb'}, ...], tightest first."""
+    found = []
+    dist = angular_distance(np.asarray(lon_a)[:, None], np.asarray(lon_b)[None, :])
+    for name, angle, orb, _ in ASPECTS:
+        for i, j in zip(*np.nonzero(np.abs(dist - angle) <= orb)):
+            found.append({'a': points[i], 'b': points[j], 'aspect': name,
+                          'orb': round(float(abs(dist[i, j] - angle)), 2)})
+    found.sort(key=lambda x: x['orb'])
+    return found
+
+
+def _top_k_rows(bins, rows, k):
+    """Best k partners of each chart in `rows` against all charts, scanning column tiles."""
+    n = len(bins)
+    k = min(k, n - 1)
+    best_idx = np.full((len(rows), k), -1, dtype=np.int64)
+    best_score = np.full((len(rows), k), -np.inf, dtype=np.float32)
+    if k <= 0:
+        return best_idx, best_score
+
+    profiles_t = np.ascontiguousarray(aspect_profiles(bins[rows]).T)
+    tile_cols = max(1, TILE_ELEMENTS // len(rows))
+    row_pos = np.arange(len(rows))
+    for start in range(0, n, tile_cols):
+        cols = np.arange(start, min(start + tile_cols, n))
+        scores = _scores_from_profiles(profiles_t, bins[cols])
+        scores[rows[:, None] == cols[None, :]] = -np.inf  # never pair a soul with itself
+
+        # Merge the tile into the running top k
+        merged_score = np.concatenate([best_score, scores], axis=1)
+        merged_idx = np.concatenate([best_idx, np.broadcast_to(cols, scores.shape)], axis=1)
+        keep = np.argpartition(-merged_score, k - 1, axis=1)[:, :k]
+        best_score = merged_score[row_pos[:, None], keep]
+        best_idx = merged_idx[row_pos[:, None], keep]
+
+    order = np.argsort(-best_score, axis=1, kind='stable')
+    return best_idx[row_pos[:, None], order], best_score[row_pos[:, None], order]
+
+
+# Process pool workers receive the binned charts once, at start-up
+_worker_bins = None
+
+
+def _init_worker(bins):
+    global _worker_bins
+    _worker_bins = bins
+
+
+def _worker_block(rows, k):
+    return _top_k_rows(_worker_bins, rows, k)
+
+
+def top_k(lons, k=10, rows=None, workers=1, block_rows=256):
+    """
+    Top-k most compatible partners per chart without building the N x N matrix.
+    lons is the (N, P) longitude array (compute_charts().longitudes, or the stored
+    placements); rows limits the query to some charts (default: all of them).
+    Returns (indices, scores), both (len(rows), k), best first.
+    With workers > 1, blocks of rows are spread over a process pool.
+    """
+    bins = to_bins(lons)
+    rows = np.arange(len(bins)) if rows is None else np.asarray(rows, dtype=np.int64)
+    blocks = [rows[i:i + block_rows] for i in range(0, len(rows), block_rows)]
+
+    if workers <= 1 or len(blocks) <= 1:
+        results = [_top_k_rows(bins, block, k) for block in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bins,)) as pool:
+            results = list(pool.map(_worker_block, blocks, [k] * len(blocks)))
+
+    if not results:
+        empty = np.empty((0, max(0, min(k, len(lons) - 1))))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def ranked_pairs(indices, scores):
+    """Distinct (i, j, score) pairs from top_k output over all rows, best first."""
+    pairs = {}
+    for i, (row_idx, row_scores) in enumerate(zip(indices, scores)):
+        for j, score in zip(row_idx, row_scores):
+            if j < 0:
+                continue
+            pairs[(min(i, j), max(i, j))] = float(score)
+    return sorted(((i, j, s) for (i, j), s in pairs.items()), key=lambda p: -p[2])
+
+
+if __name__ == '__main__':
+    # Quick throughput check on random charts
+    rng = np.random.default_rng(0)
+    for n in (1000, 5000):
+        charts = rng.uniform(0, 360, size=(n, len(CHART_POINTS)))
+        start = time.perf_counter()
+        top_k(charts, k=10)
+        elapsed = time.perf_counter() - start
+        print(f"✅ top-10 for {n} charts: {elapsed:.2f}s ({n * (n - 1) / elapsed:,.0f} pairs/sec)")
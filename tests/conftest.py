@@ -0,0 +1,18 @@
+import json
+import os
+import sys
+import tempfile
+
+# app.py configures itself from the environment at import time, so point it at a
+# scratch database and an offline geocoder before any test imports it
+_workdir = tempfile.mkdtemp(prefix='inside_time_tests_')
+_places = os.path.join(_workdir, 'places.json')
+with open(_places, 'w', encoding='utf-8') as f:
+    json.dump({'Haifa': [32.794, 34.9896], 'Tel Aviv': [32.0853, 34.7818]}, f)
+
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'souls.db')}"
+os.environ['GEOCODER_OFFLINE_FILE'] = _places
+os.environ['GEOCODE_CACHE_PATH'] = os.path.join(_workdir, 'geocode_cache.db')
+os.environ.pop('CHART_CACHE_PATH', None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
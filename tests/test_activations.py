@@ -0,0 +1,24 @@
+import app as app_module
+from app import app
+
+
+def test_empty_precomputed_day_is_served_without_a_live_scan(monkeypatch):
+    monkeypatch.setattr(app_module, 'find_activations', lambda jd, orb: [])
+    result = app.test_cli_runner().invoke(args=['precompute-activations', '--orb', '0.5'])
+    assert result.exit_code == 0, result.output
+
+    def no_live_scan(jd, orb):
+        raise AssertionError("the precomputed day should be used")
+
+    monkeypatch.setattr(app_module, 'find_activations', no_live_scan)
+    response = app.test_client().get('/activations')
+    assert response.status_code == 200
+    assert 'orb 0.5°' in response.get_data(as_text=True)
+    assert '• live' not in response.get_data(as_text=True)
+
+
+def test_orb_out_of_range_is_rejected():
+    runner = app.test_cli_runner()
+    for orb in ('0', '-1', '31'):
+        result = runner.invoke(args=['precompute-activations', '--orb', orb])
+        assert result.exit_code == 2, result.output
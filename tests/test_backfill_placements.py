@@ -0,0 +1,65 @@
+from collections import Counter
+
+import population_stats
+from app import app, db, User, Placement, PlacementStat, CHART_POINTS
+
+
+def add_user(name, birth_time):
+    user = User(name=name, city='Haifa', birth_date='1985-06-15', birth_time=birth_time,
+                latitude=32.794, longitude=34.9896)
+    db.session.add(user)
+    return user
+
+
+def test_backfill_rebuilds_every_user_in_chunks():
+    with app.app_context():
+        users = [add_user(f'backfill {i}', f'{8 + i}:15') for i in range(5)]
+        broken = add_user('backfill broken', 'soon')
+        db.session.flush()
+        # A stale row and one belonging to a user that no longer exists
+        db.session.add(Placement(user_id=users[0].id, body='Sun', sign='Aries', degree=1, house=1, longitude=0.5))
+        db.session.add(Placement(user_id=999999, body='Sun', sign='Aries', degree=1, house=1, longitude=0.5))
+        db.session.commit()
+        ids = [u.id for u in users]
+        broken_id = broken.id
+
+    result = app.test_cli_runner().invoke(args=['backfill-placements', '--chunk-size', '2'])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        per_user = Counter(user_id for (user_id,) in db.session.query(Placement.user_id))
+        assert all(per_user[user_id] == len(CHART_POINTS) for user_id in ids)
+        assert per_user[broken_id] == 0
+        assert per_user[999999] == 0
+
+        counted = {(s.body, s.kind, s.slot): s.count for s in PlacementStat.query}
+        expected = population_stats.slot_counts(
+            {'body': p.body, 'sign': p.sign, 'degree': p.degree, 'house': p.house} for p in Placement.query)
+        assert {k: v for k, v in counted.items() if v} == dict(expected)
+
+
+def test_failed_backfill_keeps_placements_of_unfinished_users(monkeypatch):
+    import app as app_module
+
+    result = app.test_cli_runner().invoke(args=['backfill-placements'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        before = db.session.query(Placement).count()
+        assert before > 0
+
+    calls = []
+    real_compute = app_module.compute_charts
+
+    def failing_compute(*args, **kwargs):
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("ephemeris went away")
+        return real_compute(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, 'compute_charts', failing_compute)
+    result = app.test_cli_runner().invoke(args=['backfill-placements', '--chunk-size', '2'])
+    assert isinstance(result.exception, RuntimeError)
+
+    with app.app_context():
+        db.session.rollback()
+        assert db.session.query(Placement).count() == before
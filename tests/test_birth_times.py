@@ -0,0 +1,42 @@
+from app import app, db, User, Placement, CHART_POINTS, compute_chart
+
+
+def add_unnormalized_user(name):
+    """A row from before birth_utc/julian_day existed, with a stale placement."""
+    user = User(name=name, city='Haifa', birth_date='1979-03-02', birth_time='06:40',
+                latitude=32.794, longitude=34.9896)
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Placement(user_id=user.id, body='Sun', sign='Aries', degree=1, house=1, longitude=0.5))
+    db.session.commit()
+    return user.id
+
+
+def assert_placements_match_julian_day(user_id):
+    user = db.session.get(User, user_id)
+    assert user.julian_day is not None
+    chart = compute_chart(user.julian_day, user.latitude, user.longitude)
+    stored = {p.body: (p.sign, p.degree, p.house) for p in Placement.query.filter_by(user_id=user_id)}
+    assert stored == {p['planet']: (p['sign'], p['degree_int'], p['house']) for p in chart}
+    assert len(stored) == len(CHART_POINTS)
+
+
+def test_backfill_birth_times_refreshes_placements():
+    with app.app_context():
+        user_id = add_unnormalized_user('birth times backfill')
+
+    result = app.test_cli_runner().invoke(args=['backfill-birth-times'])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        assert_placements_match_julian_day(user_id)
+
+
+def test_profile_normalization_refreshes_placements():
+    with app.app_context():
+        user_id = add_unnormalized_user('birth times profile')
+
+    assert app.test_client().get(f'/profile/{user_id}').status_code == 200
+
+    with app.app_context():
+        assert_placements_match_julian_day(user_id)
@@ -0,0 +1,34 @@
+from chart_cache import ChartCache
+
+
+def chart(i):
+    return [{'planet': 'Sun', 'degree_total': float(i)}]
+
+
+def test_eviction_unlinks_owners():
+    cache = ChartCache(maxsize=10)
+    for i in range(1000):
+        cache.get_or_compute(i, 0, 0, lambda: chart(i), owner=i)
+    assert cache.stats()['size'] == 10
+    assert cache.stats()['owners'] == 10
+
+
+def test_shared_chart_keeps_every_owner_on_disk(tmp_path):
+    path = str(tmp_path / 'charts.db')
+    cache = ChartCache(maxsize=10, disk_path=path)
+    cache.get_or_compute(1.0, 0, 0, lambda: chart(1), owner=1)
+    cache.get_or_compute(1.0, 0, 0, lambda: chart(1), owner=2)
+
+    # A fresh process only has the disk tier; owner 1 must still be able to drop the chart
+    restarted = ChartCache(maxsize=10, disk_path=path)
+    restarted.invalidate_owner(1)
+    computed = []
+    restarted.get_or_compute(1.0, 0, 0, lambda: computed.append(1) or chart(1))
+    assert computed == [1]
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = ChartCache(maxsize=5, disk_path=str(tmp_path / 'charts.db'), disk_maxsize=50)
+    for i in range(500):
+        cache.get_or_compute(i, 0, 0, lambda: chart(i), owner=i)
+    assert cache.stats()['disk_size'] <= 50
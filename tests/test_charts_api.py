@@ -0,0 +1,34 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import app as app_module
+from app import app, chart_results
+
+JOBS = [(i, 2447892.5 + i, 32.0853, 34.7818) for i in range(4)]
+
+
+def test_inline_batch_failure_becomes_per_item_errors(monkeypatch):
+    def broken_slice(*args):
+        raise RuntimeError("ephemeris files missing")
+
+    monkeypatch.setattr(app_module, 'chart_slice', broken_slice)
+    monkeypatch.setitem(app.config, 'CHARTS_API_CHUNK_SIZE', 100)
+    with app.app_context():
+        results = sorted(chart_results(JOBS))
+    assert results == [(i, None, "Chart calculation failed") for i in range(4)]
+
+
+def test_broken_pool_is_replaced(monkeypatch):
+    monkeypatch.setitem(app.config, 'CHARTS_API_WORKERS', 2)
+    monkeypatch.setitem(app.config, 'CHARTS_API_CHUNK_SIZE', 1)
+    broken = ProcessPoolExecutor(max_workers=1)
+    broken.submit(os._exit, 1).exception()
+    monkeypatch.setattr(app_module, '_chart_pool', broken)
+
+    with app.app_context():
+        results = sorted(chart_results(JOBS))
+    assert [index for index, _, _ in results] == [0, 1, 2, 3]
+    assert all(chart and error is None for _, chart, error in results)
+    assert app_module._chart_pool is not broken
+    app_module._chart_pool.shutdown()
+    app_module._chart_pool = None
@@ -0,0 +1,24 @@
+import os
+
+from app import app, create_app, db, User
+
+
+def test_instances_have_their_own_config_and_database(tmp_path):
+    other = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'other.db'}",
+                        'CHARTS_API_MAX_RECORDS': 2})
+    assert other is not app
+    assert os.path.exists(tmp_path / 'other.db')
+
+    record = {'birth_date': '1990-01-01', 'birth_time': '10:00', 'latitude': 32.0, 'longitude': 34.0}
+    assert other.test_client().post('/api/charts', json=[record] * 3).status_code == 413
+    assert app.test_client().post('/api/charts', json=[record] * 3).status_code == 200
+
+    response = other.test_client().post('/save_db', data={
+        'name': 'second instance', 'city': 'Haifa', 'birth_date': '1990-01-01', 'birth_time': '10:00',
+        'latitude': '32.794', 'longitude': '34.9896'})
+    assert response.status_code == 302
+    with other.app_context():
+        assert User.query.filter_by(name='second instance').count() == 1
+    with app.app_context():
+        assert User.query.filter_by(name='second instance').count() == 0
+    assert other.test_client().get(response.headers['Location']).status_code == 200
@@ -0,0 +1,45 @@
+import gzip
+import json
+
+from app import app, asset_manifest, DEGREE_DATA_VERSION
+
+
+def test_gzip_and_identity_bodies_have_different_etags():
+    client = app.test_client()
+    zipped = client.get('/api/degree_bundle', headers={'Accept-Encoding': 'gzip'})
+    plain = client.get('/api/degree_bundle', headers={'Accept-Encoding': 'identity'})
+
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in plain.headers
+    assert json.loads(gzip.decompress(zipped.data)) == json.loads(plain.data)
+    assert zipped.headers['ETag'] != plain.headers['ETag']
+    assert plain.headers['ETag'] == f'"{DEGREE_DATA_VERSION}"'
+
+
+def test_identity_client_is_not_validated_against_the_gzip_tag():
+    client = app.test_client()
+    gzip_tag = client.get('/api/degree_bundle', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    revalidated = client.get('/api/degree_bundle', headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzip_tag})
+    assert revalidated.status_code == 304
+    plain = client.get('/api/degree_bundle', headers={'Accept-Encoding': 'identity', 'If-None-Match': gzip_tag})
+    assert plain.status_code == 200
+    assert json.loads(plain.data)['version'] == DEGREE_DATA_VERSION
+
+
+def test_last_modified_follows_the_image_manifest():
+    response = app.test_client().get('/api/degree_bundle')
+    assert response.last_modified >= asset_manifest.updated_at.replace(microsecond=0)
+
+
+def test_entries_carry_the_sign_icon_and_its_variants():
+    degrees = json.loads(app.test_client().get('/api/degree_bundle').data)['degrees']
+    entry = degrees['Aries-1']
+    rel_path = asset_manifest.sign_icon_path('Aries')
+
+    if rel_path is None:
+        assert entry['symbol_url'] is None
+        return
+    assert entry['symbol_url'].endswith(f"/{asset_manifest.digests[rel_path]}/{rel_path}")
+    for fmt, entries in asset_manifest.srcset_entries(rel_path).items():
+        assert entry['symbol_srcset'][fmt].count('w,') == len(entries) - 1
@@ -0,0 +1,36 @@
+import json
+
+import numpy as np
+
+import ephemeris_table
+
+
+def test_build_writes_table_and_sidecar(tmp_path):
+    path = str(tmp_path / 'eph.npy')
+    ephemeris_table.build(path, 2000, 2000)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['eph.npy', 'eph.npy.json']
+    table = ephemeris_table.activate(path)
+    assert table is not None
+    assert table.meta['bodies'] == ephemeris_table.BODY_NAMES
+    assert table.covers([table.start_jd + 100]).all()
+
+
+def test_table_for_other_bodies_falls_back_to_swe(tmp_path, capsys):
+    path = str(tmp_path / 'eph.npy')
+    np.save(path, np.zeros((3, 2, 2)))
+    with open(ephemeris_table.meta_path(path), 'w', encoding='utf-8') as f:
+        json.dump({'start_jd': 2451544.5, 'step_days': 1.0, 'bodies': ['Sun', 'Moon']}, f)
+
+    assert ephemeris_table.activate(path) is None
+    assert ephemeris_table.active() is None
+    assert 'Ignoring ephemeris table' in capsys.readouterr().out
+
+
+def test_damaged_sidecar_falls_back_to_swe(tmp_path):
+    path = str(tmp_path / 'eph.npy')
+    np.save(path, np.zeros((3, 2, 2)))
+    with open(ephemeris_table.meta_path(path), 'w', encoding='utf-8') as f:
+        f.write('{"start_jd": ')
+
+    assert ephemeris_table.activate(path) is None
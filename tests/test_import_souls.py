@@ -0,0 +1,19 @@
+from app import app, db, User, import_souls
+
+
+def test_out_of_range_coordinates_skip_only_that_row():
+    records = [
+        {'name': 'before', 'city': 'Haifa', 'birth_date': '1990-01-01', 'birth_time': '10:00'},
+        {'name': 'bad', 'city': 'Nowhere', 'birth_date': '1990-01-01', 'birth_time': '10:00',
+         'latitude': 200.0, 'longitude': 34.0},
+        {'name': 'after', 'city': 'Tel Aviv', 'birth_date': '1991-02-02', 'birth_time': '11:30'},
+    ]
+    with app.app_context():
+        progress = list(import_souls(records, batch_size=10, workers=1))
+
+        assert progress[-1]['imported'] == 2
+        assert progress[-1]['skipped'] == 1
+        assert progress[-1]['errors'] == [{'row': 2, 'error': 'coordinates out of range: 200.0, 34.0'}]
+        names = {u.name for u in User.query.filter(User.name.in_(['before', 'bad', 'after']))}
+        assert names == {'before', 'after'}
+        assert db.session.query(User).filter_by(name='after').one().julian_day is not None
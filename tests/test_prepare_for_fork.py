@@ -0,0 +1,14 @@
+import gc
+
+import app as app_module
+
+
+def test_prepare_for_fork_runs_once(monkeypatch):
+    freezes = []
+    monkeypatch.setattr(gc, 'freeze', lambda: freezes.append(1))
+    monkeypatch.setattr(app_module, '_prepared_for_fork', False)
+
+    app_module.prepare_for_fork()
+    app_module.prepare_for_fork()
+
+    assert freezes == [1]
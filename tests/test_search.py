@@ -0,0 +1,83 @@
+import math
+
+import pytest
+
+import app as app_module
+from app import app
+from search_index import ContentSearch, build_index, content_documents, tokens, K1, B
+
+CONTENT = {
+    'degrees': {
+        ('Aries', 1): {'sentence': 'A spark of courage.', 'header': 'Courage',
+                       'body': 'Courage and fire. <script>alert("x")</script> Courage wins & burns.'},
+        ('Aries', 2): {'sentence': 'Quiet dreams.', 'header': 'Dreams',
+                       'body': 'Dreams of the sea, dreaming of ships.'},
+        ('Taurus', 1): {'sentence': 'Patience.', 'header': 'Patience',
+                        'body': 'Slow courage, patient dreams.'},
+    },
+    'signs': {('Venus', 'Pisces'): 'Love as an ocean of dreams and courage.'},
+    'houses': {('Mars', 10): 'Ambition and courage in public life.'},
+}
+
+
+def brute_force_bm25(query):
+    """BM25 over the weighted term frequencies, computed directly per document."""
+    docs = content_documents(CONTENT)
+    postings, lengths = build_index(docs)
+    n, avg = len(docs), sum(lengths) / len(docs)
+    scores, matched = {}, {}
+    for term in dict.fromkeys(tokens(query)):
+        plist = postings.get(term, [])
+        idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+        for doc_id, tf in plist:
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[doc_id] / avg))
+            matched[doc_id] = matched.get(doc_id, 0) + 1
+    return docs, scores, matched
+
+
+def doc_key(result):
+    key = result['key']
+    if result['kind'] == 'degree':
+        return 'degree', key['sign'], str(key['degree'])
+    if result['kind'] == 'sign':
+        return 'sign', key['planet'], key['sign']
+    return 'house', key['planet'], str(key['house'])
+
+
+@pytest.mark.parametrize('query', ['courage', 'dreams courage', 'dreaming'])
+def test_ranking_matches_bm25(query):
+    results = ContentSearch(CONTENT).search(query, limit=10)
+    docs, scores, matched = brute_force_bm25(query)
+
+    assert len(results) == len(scores)
+    # More matched terms first, then by BM25 score
+    keys = [(-r['matched'], -r['score']) for r in results]
+    assert keys == sorted(keys)
+    by_key = {(kind, k1, k2): doc_id for doc_id, (kind, k1, k2, _) in enumerate(docs)}
+    for r in results:
+        doc_id = by_key[doc_key(r)]
+        assert r['score'] == pytest.approx(scores[doc_id], abs=1e-3)
+        assert r['matched'] == matched[doc_id]
+
+
+def test_kinds_filter_and_limit():
+    search = ContentSearch(CONTENT)
+    assert {r['kind'] for r in search.search('courage', kinds=['house'])} == {'house'}
+    assert len(search.search('courage', limit=2)) == 2
+    assert search.search('the and of') == []
+
+
+def test_api_snippets_escape_content(monkeypatch):
+    monkeypatch.setattr(app_module, 'content_search', ContentSearch(CONTENT))
+    client = app.test_client()
+
+    results = client.get('/api/search?q=courage&kind=degree').get_json()['results']
+    snippet = next(r['snippet'] for r in results if r['key'] == {'sign': 'Aries', 'degree': 1})
+    assert '<script>' not in snippet
+    assert '&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt;' in snippet
+    assert '&amp;' in snippet
+    assert '<mark>Courage</mark>' in snippet
+
+    page = client.get('/search?q=courage').get_data(as_text=True)
+    assert '<script>alert' not in page
+    assert '&lt;script&gt;' in page
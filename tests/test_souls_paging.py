@@ -0,0 +1,62 @@
+import base64
+import math
+
+import pytest
+
+from app import app, db, User
+
+
+@pytest.fixture(scope='module')
+def tied_souls():
+    names = ['Zzpage Same'] * 7 + ['zzpage same'] * 3 + ['ZZPAGE Other'] * 2 + ['Zzpage Alone']
+    with app.app_context():
+        users = [User(name=name, city='Zzcity', birth_date='1990-01-01', birth_time='10:00',
+                      latitude=32.0, longitude=34.0) for name in names]
+        db.session.add_all(users)
+        db.session.commit()
+        return sorted((u.name.lower(), u.id) for u in users)
+
+
+def all_pages(client, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, **({'after': cursor} if cursor else {}))
+        response = client.get('/api/souls', query_string=query)
+        assert response.status_code == 200
+        body = response.get_json()
+        ids.extend(s['id'] for s in body['souls'])
+        pages += 1
+        cursor = body['next']
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.parametrize('limit', [1, 3, 5, 13, 50])
+def test_keyset_pages_have_no_gaps_or_duplicates(tied_souls, limit):
+    ids, pages = all_pages(app.test_client(), q='zzpage', limit=limit)
+    assert ids == [user_id for _, user_id in tied_souls]
+    assert pages == math.ceil(len(tied_souls) / limit)
+
+
+def test_paging_by_city(tied_souls):
+    ids, _ = all_pages(app.test_client(), q='zzcity', field='city', limit=4)
+    assert ids == sorted(user_id for _, user_id in tied_souls)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64 at all!',
+    base64.urlsafe_b64encode(b'garbage').decode(),
+    base64.urlsafe_b64encode(b'[1]').decode(),
+    base64.urlsafe_b64encode(b'["name", null]').decode(),
+    base64.urlsafe_b64encode(b'["name", "seven"]').decode(),
+    base64.urlsafe_b64encode(b'{"key": 1}').decode(),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+])
+def test_malformed_cursor_is_a_400(cursor):
+    response = app.test_client().get('/api/souls', query_string={'after': cursor})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor or limit'}
+
+
+def test_malformed_limit_is_a_400():
+    assert app.test_client().get('/api/souls?limit=many').status_code == 400
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import synastry
+from app import app, db, User, add_placements, compute_chart, data_version, synastry_matrix
+
+
+def brute_force_scores(lons):
+    """Every pair scored directly from the strength table, P x P offsets at a time."""
+    bins = synastry.to_bins(lons)
+    offsets = (bins[None, :, None, :] - bins[:, None, :, None]) % synastry.N_BINS
+    scores = synastry.STRENGTH_TABLE[offsets].sum(axis=(2, 3)).astype(np.float64)
+    np.fill_diagonal(scores, -np.inf)
+    return scores
+
+
+@pytest.fixture
+def charts():
+    return np.random.default_rng(3).uniform(0, 360, size=(40, 13))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_top_k_matches_brute_force(charts, workers, monkeypatch):
+    # Small tiles and blocks so the running top-k merge and the pool path are both exercised
+    monkeypatch.setattr(synastry, 'TILE_ELEMENTS', 64)
+    expected = brute_force_scores(charts)
+    indices, scores = synastry.top_k(charts, k=5, workers=workers, block_rows=8)
+
+    assert indices.shape == scores.shape == (40, 5)
+    for i in range(40):
+        best = np.sort(expected[i])[::-1][:5]
+        np.testing.assert_allclose(scores[i], best, atol=1e-3)
+        np.testing.assert_allclose(expected[i, indices[i]], scores[i], atol=1e-3)
+        assert i not in indices[i]
+
+
+def test_ranked_pairs_covers_every_pair_in_order(charts):
+    expected = brute_force_scores(charts)
+    indices, scores = synastry.top_k(charts, k=len(charts) - 1)
+    pairs = synastry.ranked_pairs(indices, scores)
+
+    assert len(pairs) == 40 * 39 // 2
+    assert {(i, j) for i, j, _ in pairs} == {(i, j) for i in range(40) for j in range(i + 1, 40)}
+    for i, j, score in pairs:
+        assert score == pytest.approx(expected[i, j], abs=1e-3)
+    assert [s for _, _, s in pairs] == sorted((s for _, _, s in pairs), reverse=True)
+
+
+def test_matrix_follows_the_placements_version():
+    with app.app_context():
+        synastry_matrix()
+        version = data_version('placements')
+
+        user = User(name='synastry newcomer', city='Haifa', birth_date='1992-09-09', birth_time='09:09',
+                    latitude=32.794, longitude=34.9896, julian_day=2448874.756)
+        db.session.add(user)
+        db.session.flush()
+        add_placements(user.id, compute_chart(user.julian_day, user.latitude, user.longitude))
+        db.session.commit()
+
+        assert data_version('placements') == version + 1
+        user_id = user.id
+        user_ids, _ = synastry_matrix()
+        assert user_id in user_ids
+
+    response = app.test_client().get(f'/api/synastry/{user_id}?k=3')
+    assert response.status_code == 200
+    assert len(response.get_json()['matches']) <= 3
@@ -0,0 +1,107 @@
+import threading
+from functools import lru_cache
+
+import pytz
+import swisseph as swe
+
+# Zone lookups are memoized per coordinate rounded to 3 decimals (~100 m)
+COORD_PRECISION = 3
+
+
+class TimezoneResolver:
+    """
+    Process-wide local time -> UTC conversion:
+    - one TimezoneFinder, built on first use (it loads its polygon data when constructed)
+    - zone names memoized by rounded coordinates
+    - UTC offsets memoized by (zone, local datetime)
+    """
+    def __init__(self, zone_cache_size=65536, offset_cache_size=65536):
+        self._finder = None
+        self._finder_lock = threading.Lock()
+        self._zone_at = lru_cache(maxsize=zone_cache_size)(self._lookup_zone)
+        self._utc_offset = lru_cache(maxsize=offset_cache_size)(self._lookup_offset)
+
+    def _timezone_finder(self, in_memory=False):
+        if self._finder is None:
+            with self._finder_lock:
+                if self._finder is None:
+                    from timezonefinder import TimezoneFinder
+                    self._finder = TimezoneFinder(in_memory=in_memory)
+        return self._finder
+
+    def preload(self):
+        """
+        Loads the polygon data into memory now - before forking workers, so they
+        share the pages and no open data file handle is inherited.
+        """
+        self._timezone_finder(in_memory=True)
+
+    def _lookup_zone(self, lat, lon):
+        return self._timezone_finder().timezone_at(lat=lat, lng=lon) or 'UTC'
+
+    @staticmethod
+    def _lookup_offset(zone, local_dt):
+        # Ambiguous or skipped times around a DST switch resolve to standard time
+        return pytz.timezone(zone).localize(local_dt, is_dst=False).utcoffset()
+
+    def zone_at(self, lat, lon):
+        """IANA zone name at a coordinate, 'UTC' where none is defined (open sea)."""
+        return self._zone_at(round(lat, COORD_PRECISION), round(lon, COORD_PRECISION))
+
+    def local_to_utc(self, local_dt, zone):
+        """
+        Naive local wall-clock time in `zone` -> naive UTC datetime.
+        Historical offsets (DST, pre-1970 zone changes) come from the tz database.
+        """
+        return local_dt - self._utc_offset(zone, local_dt)
+
+    def normalize(self, local_dt, lat, lon):
+        """{'birth_utc', 'julian_day', 'timezone'} for a local birth time at a place."""
+        zone = self.zone_at(lat, lon)
+        utc_dt = self.local_to_utc(local_dt, zone)
+        return {'birth_utc': utc_dt, 'julian_day': julian_day(utc_dt), 'timezone': zone}
+
+    def normalize_many(self, items):
+        """
+        Batch form of normalize() for (local_dt, lat, lon) triples, in input order.
+        Each distinct place is looked up once no matter how it is interleaved.
+        """
+        items = list(items)
+        zones = {}
+        for _, lat, lon in items:
+            key = (round(lat, COORD_PRECISION), round(lon, COORD_PRECISION))
+            if key not in zones:
+                zones[key] = self._zone_at(*key)
+
+        results = []
+        for local_dt, lat, lon in items:
+            zone = zones[(round(lat, COORD_PRECISION), round(lon, COORD_PRECISION))]
+            utc_dt = self.local_to_utc(local_dt, zone)
+            results.append({'birth_utc': utc_dt, 'julian_day': julian_day(utc_dt), 'timezone': zone})
+        return results
+
+    def stats(self):
+        zones, offsets = self._zone_at.cache_info(), self._utc_offset.cache_info()
+        return {
+            'finder_loaded': self._finder is not None,
+            'zones': {'size': zones.currsize, 'hits': zones.hits, 'misses': zones.misses},
+            'offsets': {'size': offsets.currsize, 'hits': offsets.hits, 'misses': offsets.misses},
+        }
+
+    def clear(self):
+        self._zone_at.cache_clear()
+        self._utc_offset.cache_clear()
+
+
+def julian_day(utc_dt):
+    hours = utc_dt.hour + utc_dt.minute / 60.0 + utc_dt.second / 3600.0
+    return swe.julday(utc_dt.year, utc_dt.month, utc_dt.day, hours)
+
+
+# Shared by the app and the bulk import
+resolver = TimezoneResolver()
+
+zone_at = resolver.zone_at
+local_to_utc = resolver.local_to_utc
+normalize_birth = resolver.normalize
+normalize_births = resolver.normalize_many
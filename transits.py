@@ -0,0 +1,141 @@
+import datetime
+from functools import lru_cache
+
+import numpy as np
+import swisseph as swe
+
+import ephemeris_table
+from batch_engine import BODIES
+from data_loader import ZODIAC_SIGNS
+
+# Coarse step per body, in days. Planets that station (turn retrograde) need steps short
+# enough that a retrograde dip into a degree can't hide between two samples; the Sun
+# and Moon never turn back, so a step may cross several degrees and each is solved for.
+COARSE_STEP = {
+    'Sun': 1.0, 'Moon': 0.25, 'Mercury': 0.25, 'Venus': 0.5, 'Mars': 0.5,
+    'Jupiter': 2.0, 'Saturn': 4.0, 'Uranus': 8.0, 'Neptune': 10.0, 'Pluto': 10.0,
+    'North Node': 10.0,
+}
+
+# Crossings are pinned down to within a minute
+TOLERANCE_DAYS = 1 / 1440
+
+BODY_IDS = dict(BODIES)
+
+
+def jd_to_datetime(jd):
+    year, month, day, hours = swe.revjul(jd)
+    return datetime.datetime(year, month, day) + datetime.timedelta(hours=hours)
+
+
+def datetime_to_jd(dt):
+    return swe.julday(dt.year, dt.month, dt.day, dt.hour + dt.minute / 60.0 + dt.second / 3600.0)
+
+
+def _longitude(jd, body_id):
+    return swe.calc_ut(jd, body_id)[0][0]
+
+
+def _signed_delta(target, lon):
+    return (target - lon + 180.0) % 360.0 - 180.0
+
+
+def _bisect(body_id, jd_lo, jd_hi, boundary):
+    lo_before = _signed_delta(boundary, _longitude(jd_lo, body_id)) > 0
+    while jd_hi - jd_lo > TOLERANCE_DAYS:
+        mid = (jd_lo + jd_hi) / 2
+        if (_signed_delta(boundary, _longitude(mid, body_id)) > 0) == lo_before:
+            jd_lo = mid
+        else:
+            jd_hi = mid
+    return (jd_lo + jd_hi) / 2
+
+
+def _find_crossing(body_id, jd_lo, jd_hi, boundary, jd_guess):
+    """
+    The moment the body's longitude passes `boundary` (0-359) inside [jd_lo, jd_hi].
+    Newton steps on the daily speed from an interpolated first guess, converging in
+    2-3 ephemeris calls; bisection takes over near stations where the speed is ~0.
+    """
+    jd = jd_guess
+    for _ in range(6):
+        pos = swe.calc_ut(jd, body_id)[0]
+        if abs(pos[3]) < 1e-4:
+            break
+        step = _signed_delta(boundary, pos[0]) / pos[3]
+        jd += step
+        if not jd_lo <= jd <= jd_hi:
+            break
+        if abs(step) < TOLERANCE_DAYS:
+            return jd
+    return _bisect(body_id, jd_lo, jd_hi, boundary)
+
+
+@lru_cache(maxsize=128)
+def ingress_table(body, start_year, end_year):
+    """
+    All integer-degree crossings of `body` between Jan 1 start_year and Jan 1 end_year + 1.
+    Returns {cell: [(enter_jd, exit_jd, retrograde), ...]} where cell = sign_idx * 30 + degree - 1.
+    enter_jd / exit_jd are None when the body was already (or still) in the degree at the range edge.
+    Retrograde re-entries show up as separate visits with retrograde=True.
+    """
+    body_id = BODY_IDS[body]
+    jd_start = swe.julday(start_year, 1, 1, 0.0)
+    jd_end = swe.julday(end_year + 1, 1, 1, 0.0)
+    step = COARSE_STEP[body]
+
+    # 1. Coarse sampling - from the daily table when one is active (only used to find
+    # which samples straddle a boundary; every crossing is then solved with swe)
+    jds = np.arange(jd_start, jd_end + step, step)
+    table = ephemeris_table.active()
+    if table is not None:
+        lons = table.longitudes(jds, [body])[:, 0]
+    else:
+        lons = np.fromiter((_longitude(jd, body_id) for jd in jds), dtype=float, count=len(jds))
+    unwrapped = np.degrees(np.unwrap(np.radians(lons)))
+    cells = np.floor(unwrapped).astype(np.int64)
+    changed = np.nonzero(np.diff(cells))[0]
+
+    # 2. Solve for every degree boundary crossed between two samples
+    visits = {}
+    current = int(cells[0]) % 360
+    entered_at, entered_retro = None, False
+    for i in changed:
+        forward = cells[i + 1] > cells[i]
+        if forward:
+            boundaries = range(cells[i] + 1, cells[i + 1] + 1)
+        else:
+            boundaries = range(cells[i], cells[i + 1], -1)
+        span = unwrapped[i + 1] - unwrapped[i]
+        for b in boundaries:
+            guess = jds[i] + (b - unwrapped[i]) / span * step
+            jd_cross = _find_crossing(body_id, jds[i], jds[i + 1], float(b % 360), guess)
+
+            visits.setdefault(current, []).append((entered_at, jd_cross, entered_retro))
+            current = (int(b) if forward else int(b) - 1) % 360
+            entered_at, entered_retro = jd_cross, not forward
+
+    visits.setdefault(current, []).append((entered_at, None, entered_retro))
+    return visits
+
+
+def degree_visits(sign, degree, start, end, bodies=None):
+    """
+    When each body is in `degree` of `sign` between two dates.
+    Returns {body: [{'enter': datetime|None, 'exit': datetime|None, 'retrograde': bool}, ...]}.
+    """
+    cell = ZODIAC_SIGNS.index(sign) * 30 + degree - 1
+    jd_lo, jd_hi = datetime_to_jd(start), datetime_to_jd(end)
+    result = {}
+    for body in bodies or [name for name, _ in BODIES]:
+        periods = []
+        for enter, leave, retro in ingress_table(body, start.year, end.year).get(cell, []):
+            if (leave is not None and leave < jd_lo) or (enter is not None and enter > jd_hi):
+                continue
+            periods.append({
+                'enter': jd_to_datetime(enter) if enter is not None and enter >= jd_lo else None,
+                'exit': jd_to_datetime(leave) if leave is not None and leave <= jd_hi else None,
+                'retrograde': retro,
+            })
+        result[body] = periods
+    return result
@@ -0,0 +1,17 @@
+"""
+Production entry point:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+APP_ENV=production turns on the production settings in app.py (SQLite WAL, no debug).
+create_app() builds the served instance, and prepare_for_fork() then warms the lazily
+loaded data once in the gunicorn master.
+"""
+import os
+
+os.environ.setdefault('APP_ENV', 'production')
+
+from app import create_app, prepare_for_fork  # noqa: E402
+
+app = create_app()
+prepare_for_fork(app)